@@ -1,21 +1,31 @@
 import aiohttp
 import asyncio
-import cachetools
 import server
 import utils
 import uvloop
 
 from config import config
+from gidgethub import abc as gh_abc
 from gidgethub import aiohttp_auth as gh_aiohttp
+from gidgethub import cache as gh_cache
+from metrics import metrics
 
-cache = cachetools.LRUCache(maxsize=500)
 
 def initialize(loop):
     config.parse(loop=loop)
 
 
 def create_github_api():
-    return gh_aiohttp.GitHubAPI('barrelman', cache=cache)
+    cache = gh_cache.ResponseCache(config.github_cache_bytes, ttl=config.github_cache_ttl)
+    metrics.register('github_cache', cache.stats)
+    scheduler = gh_abc.RateLimitScheduler(write_reserve=config.github_write_reserve)
+    retry_policy = gh_abc.RetryPolicy(attempts=config.github_attempts,
+                                      failure_threshold=config.github_circuit_threshold,
+                                      recovery_time=config.github_circuit_recovery,
+                                      transient=(aiohttp.ClientError, asyncio.TimeoutError))
+    return gh_aiohttp.GitHubAPI('barrelman', cache=cache, scheduler=scheduler, retry_policy=retry_policy,
+                                limit_per_host=config.github_connections,
+                                keepalive_timeout=config.github_keepalive)
 
 
 def run_pre_start_coroutines(loop, gh_api):
@@ -0,0 +1,50 @@
+"""Time accepting and completing webhook events with and without the journal.
+
+Run from src/ with `PYTHONPATH=. python benchmarks/journal.py`. Prints the
+events per second through append and done, which bounds how fast webhooks
+can be acknowledged with JOURNAL_PATH set.
+"""
+import json
+import os
+import tempfile
+import time
+
+from gidgethub import sansio
+from server import journal
+
+EVENTS = 20000
+
+BODY = json.dumps({
+    'action': 'synchronize',
+    'number': 1,
+    'pull_request': {'number': 1, 'head': {'sha': '0' * 40}, 'body': 'x' * 4000},
+    'repository': {'full_name': 'owner/repo'},
+}).encode()
+
+
+def run(event_journal):
+    events = [sansio.Event(json.loads(BODY), event='pull_request', delivery_id=str(index))
+              for index in range(EVENTS)]
+    started = time.perf_counter()
+    for event in events:
+        if event_journal is not None:
+            event_journal.append(event, BODY, 'application/json')
+    for event in events:
+        if event_journal is not None:
+            event_journal.done(event)
+    return time.perf_counter() - started
+
+
+def main():
+    print(f'journal off: {EVENTS / max(run(None), 1e-9):12.0f} events/s')
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'journal.db')
+        event_journal = journal.Journal(path)
+        seconds = run(event_journal)
+        print(f'journal on:  {EVENTS / seconds:12.0f} events/s '
+              f'{seconds / EVENTS * 1e6:7.1f} us/event')
+        event_journal.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,37 @@
+"""Time the installed JSON codecs on GitHub payloads of typical sizes.
+
+Run from src/ with `PYTHONPATH=. python benchmarks/json_codec.py`. The
+payloads are the recorded API responses the gidgethub tests use: a single
+pull request, about the size of a pull_request webhook, and pages of pull
+requests.
+"""
+import pathlib
+import timeit
+
+from gidgethub import codec
+
+SAMPLES = pathlib.Path(__file__).parent.parent / 'gidgethub' / 'test' / 'samples'
+PAYLOADS = ['pr_single', 'pr_page_last', 'pr_page_1']
+
+
+def main():
+    codecs = []
+    for name in codec.CODECS:
+        try:
+            codecs.append(codec.load(name))
+        except ImportError:
+            print(f'{name} is not installed')
+
+    for payload in PAYLOADS:
+        body = (SAMPLES / payload / 'body').read_bytes()
+        data = codecs[0].loads(body)
+        runs = max(1, 2000000 // len(body))
+        for json_codec in codecs:
+            loads = min(timeit.repeat(lambda: json_codec.loads(body), number=runs, repeat=3)) / runs
+            dumps = min(timeit.repeat(lambda: json_codec.dumps(data), number=runs, repeat=3)) / runs
+            print(f'{payload:>13} {len(body):>7} bytes {json_codec.name:>7}: '
+                  f'loads {loads * 1e6:9.1f} us  dumps {dumps * 1e6:9.1f} us')
+
+
+if __name__ == '__main__':
+    main()
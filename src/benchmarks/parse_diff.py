@@ -0,0 +1,41 @@
+"""Time structured_diff.parse on synthetic diffs of growing size.
+
+Run from src/ with `PYTHONPATH=. python benchmarks/parse_diff.py`. The time
+per line should stay flat as the diff grows.
+"""
+import random
+import timeit
+
+from parser import structured_diff
+
+SIZES = [10000, 100000, 1000000]
+
+LINES = [
+    ' unchanged context line\n',
+    '-removed_call(argument)\n',
+    '+added_call(argument)  # TODO: remove\n',
+    '+import requests\n',
+]
+
+
+def make_diff(lines):
+    random.seed(lines)
+    hunk = ['diff --git a/module.py b/module.py\n',
+            'index 3b18e51..a9c3e42 100644\n',
+            '--- a/module.py\n',
+            '+++ b/module.py\n',
+            '@@ -1,100 +1,100 @@\n']
+    body = [random.choice(LINES) for _ in range(lines - len(hunk))]
+    return ''.join(hunk + body)
+
+
+def main():
+    for lines in SIZES:
+        diff = make_diff(lines)
+        runs = max(1, 1000000 // lines)
+        seconds = min(timeit.repeat(lambda: structured_diff.parse(diff), number=runs, repeat=3)) / runs
+        print(f'{lines:>9} lines: {seconds * 1000:9.2f} ms {seconds / lines * 1e9:7.1f} ns/line')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""Time RuleSet.match against searching every rule on its own.
+
+Run from src/ with `PYTHONPATH=. python benchmarks/rule_set.py`. Rules have
+distinct required literals, a few of which occur in the diff; the
+prefiltered RuleSet should win at every rule count.
+"""
+import random
+import re
+import timeit
+
+from rules import rule, rule_set
+
+RULE_COUNTS = [5, 20, 200]
+DIFF_BYTES = 4600000
+
+WORDS = ['foo', 'bar', 'self', 'return', 'value', 'import', 'x', '12', '(', ')', '=']
+
+
+def make_text(size):
+    random.seed(size)
+    lines = []
+    length = 0
+    while length < size:
+        line = ' '.join(random.choice(WORDS) for _ in range(8)) + '\n'
+        lines.append(line)
+        length += len(line)
+    # A few rules fire, late in the text.
+    lines.append('foo_1_x = foo_3_x\n')
+    return ''.join(lines)
+
+
+def make_rules(count):
+    return [rule.BarrelmanPatternRule(f'foo_{index}_x\\b', ['someone']) for index in range(count)]
+
+
+def main():
+    text = make_text(DIFF_BYTES)
+    for count in RULE_COUNTS:
+        rules = make_rules(count)
+        compiled = rule_set.RuleSet(rules)
+        regexes = [re.compile(r.pattern) for r in rules]
+
+        def alone():
+            return [regex for regex in regexes if regex.search(text) is not None]
+
+        assert len(alone()) == len(compiled.match(text))
+        baseline = min(timeit.repeat(alone, number=1, repeat=3))
+        merged = min(timeit.repeat(lambda: compiled.match(text), number=1, repeat=3))
+        print(f'{count:>4} rules {len(text) / 1e6:.1f} MB: per rule search {baseline:7.3f} s  '
+              f'RuleSet.match {merged:7.3f} s')
+
+
+if __name__ == '__main__':
+    main()
@@ -29,6 +29,105 @@ class Config:
         self.github_app_installation_id = _required_str(
             'GITHUB_APP_INSTALLATION_ID')
 
+        # Number of matches to quote per triggered rule, 0 to only list rules.
+        self.match_locations = _int(
+            'MATCH_LOCATIONS', 0)
+
+        # Globs of files never matched against rules, the defaults when unset.
+        self.skip_paths = _list(
+            'SKIP_PATHS')
+        # Files adding more than this many bytes are not matched, 0 for no limit.
+        self.max_file_bytes = _int(
+            'MAX_FILE_BYTES', 1024 * 1024)
+
+        # Processes matching rules off the event loop, 0 to match on the loop.
+        self.match_workers = _int(
+            'MATCH_WORKERS', 0)
+        # Seconds of matching allowed per PR before its worker is recycled.
+        self.match_timeout = _float(
+            'MATCH_TIMEOUT', 30.0)
+
+        # Also time patterns on crafted input when barrelman.yml is loaded.
+        self.redos_fuzz = _bool(
+            'REDOS_FUZZ')
+
+        # Webhook events are acknowledged at once and processed by these workers,
+        # each taking the events of its share of pull requests in order.
+        self.webhook_workers = _int(
+            'WEBHOOK_WORKERS', 4)
+        # Events waiting beyond this are refused with a 503.
+        self.webhook_queue_size = _int(
+            'WEBHOOK_QUEUE_SIZE', 100)
+
+        # Webhook payloads larger than this many bytes are refused with a 413.
+        self.max_body_bytes = _int(
+            'MAX_BODY_BYTES', 2 * 1024 * 1024)
+
+        # Seconds to wait for a pull request's head commit to show up in the API.
+        self.readiness_timeout = _float(
+            'READINESS_TIMEOUT', 10.0)
+
+        # Seconds each webhook callback may run before it is cancelled, 0 for no limit.
+        self.callback_timeout = _float(
+            'CALLBACK_TIMEOUT', 300.0) or None
+
+        # Seconds a pull request event waits for newer pushes that replace it.
+        self.coalesce_delay = _float(
+            'COALESCE_DELAY', 2.0)
+
+        # Where delivery ids are remembered to drop redeliveries: memory or sqlite.
+        self.dedup_backend = os.getenv(
+            'DEDUP_BACKEND', 'memory')
+        # Seconds a delivery id is remembered.
+        self.dedup_ttl = _float(
+            'DEDUP_TTL', 24 * 60 * 60.0)
+        # Delivery ids kept by the memory backend.
+        self.dedup_max_size = _int(
+            'DEDUP_MAX_SIZE', 10000)
+        # Database file of the sqlite backend.
+        self.dedup_path = os.getenv(
+            'DEDUP_PATH', 'barrelman-deliveries.db')
+
+        # SQLite file journaling accepted events so they survive restarts, unset to disable.
+        self.journal_path = os.getenv(
+            'JOURNAL_PATH')
+        # Restarts an unfinished event is replayed on before it is dropped.
+        self.journal_max_replays = _int(
+            'JOURNAL_MAX_REPLAYS', 3)
+
+        # Pooled connections to the GitHub API and seconds idle ones are kept open.
+        self.github_connections = _int(
+            'GITHUB_CONNECTIONS', 10)
+        self.github_keepalive = _float(
+            'GITHUB_KEEPALIVE', 30.0)
+
+        # Share of the API rate limit kept for reads; writes wait for the reset below it.
+        self.github_write_reserve = _float(
+            'GITHUB_WRITE_RESERVE', 0.1)
+
+        # Tries per GitHub API request; only idempotent ones are retried on errors.
+        self.github_attempts = _int(
+            'GITHUB_ATTEMPTS', 3)
+        # Failures in a row after which requests wait this many seconds before
+        # connecting again.
+        self.github_circuit_threshold = _int(
+            'GITHUB_CIRCUIT_THRESHOLD', 5)
+        self.github_circuit_recovery = _float(
+            'GITHUB_CIRCUIT_RECOVERY', 30.0)
+
+        # Bytes of GitHub responses kept for conditional requests, and for how many seconds.
+        self.github_cache_bytes = _int(
+            'GITHUB_CACHE_BYTES', 64 * 1024 * 1024)
+        self.github_cache_ttl = _float(
+            'GITHUB_CACHE_TTL', 3600.0)
+
+        # JSON library for GitHub payloads: auto picks the fastest installed one.
+        self.json_codec = os.getenv(
+            'JSON_CODEC', 'auto')
+        # Imported here as gidgethub itself reads the config.
+        from gidgethub import codec
+        codec.use(codec.load(self.json_codec))
+
         self.github_app_private_key = os.getenv('GITHUB_APP_PRIVATE_KEY')
         self.github_webhook_secret = os.getenv('GITHUB_WEBHOOK_SECRET')
 
@@ -76,6 +175,33 @@ def _required_str(name):
     return value
 
 
+def _int(name, default):
+    value = os.getenv(name)
+    if not value:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise OSError('%s must be an integer.' % name)
+
+
+def _float(name, default):
+    value = os.getenv(name)
+    if not value:
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        raise OSError('%s must be a number.' % name)
+
+
+def _list(name):
+    value = os.getenv(name)
+    if value is None:
+        return None
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
 def _bool(name):
     value = os.getenv(name, '').lower()
     return value == 'true' or value == '1' or value == 't'
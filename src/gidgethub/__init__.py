@@ -17,6 +17,35 @@ class ValidationFailure(GitHubException):
     # https://developer.github.com/webhooks/securing/#validating-payloads-from-github
 
 
+class DispatchError(GitHubException):
+
+    """One or more callbacks failed while dispatching an event.
+
+    The exceptions raised by the callbacks, including timeouts, are stored
+    in the errors attribute.
+    """
+
+    def __init__(self, errors: Any) -> None:
+        self.errors = errors
+        super().__init__(f"{len(errors)} callback(s) failed: "
+                         + ", ".join(repr(error) for error in errors))
+
+
+class CircuitOpen(GitHubException):
+
+    """Requests to a host fail fast after it failed repeatedly.
+
+    The retry_in attribute is the number of seconds until requests to the
+    host are tried again.
+    """
+
+    def __init__(self, host: str, retry_in: float) -> None:
+        self.host = host
+        self.retry_in = retry_in
+        super().__init__(f"requests to {host} are failing, "
+                         f"retrying in {retry_in:.0f} seconds")
+
+
 class HTTPException(GitHubException):
 
     """A general exception to represent HTTP responses."""
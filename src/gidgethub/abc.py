@@ -1,25 +1,206 @@
 """Provide an abstract base class for easier requests."""
 import abc
-import json
+import asyncio
+import email.utils
+import math
+import random
+import time
 from typing import Any, AsyncGenerator, Dict, Mapping, MutableMapping, Tuple
 from typing import Optional as Opt
+import urllib.parse
 
-from . import sansio
+from . import CircuitOpen
+from . import codec, sansio
 
 
 # Value represents etag, last-modified, data, and next page.
 CACHE_TYPE = MutableMapping[str, Tuple[Opt[str], Opt[str], Any, Opt[str]]]
 
 
+# Request priorities, most urgent first.
+READ = 0
+WRITE = 1
+_PRIORITY_NAMES = {READ: "read", WRITE: "write"}
+
+
+class RateLimitScheduler:
+
+    """Hold back requests the rate limit has no room for until it resets.
+
+    Reads may use up the whole limit while writes stop once only
+    'write_reserve' of it is left, so the requests needed to act on an
+    event keep working when the limit runs low. Requests that do not fit
+    are deferred until the reset rather than failed; writes wait
+    'write_delay' seconds longer so the reads deferred with them go first.
+    """
+
+    def __init__(self, *, write_reserve: float = 0.1,
+                 write_delay: float = 1.0) -> None:
+        self.write_reserve = write_reserve
+        self.write_delay = write_delay
+        self.waiting = {priority: 0 for priority in _PRIORITY_NAMES}
+        self.deferred = {priority: 0 for priority in _PRIORITY_NAMES}
+        self.granted = {priority: 0 for priority in _PRIORITY_NAMES}
+        self._rate_limit: Opt[sansio.RateLimit] = None
+
+    def _floor(self, priority: int, rate_limit: sansio.RateLimit) -> int:
+        """Return how many requests must remain for priority to go ahead."""
+        if priority == READ:
+            return 0
+        return math.ceil(rate_limit.limit * self.write_reserve)
+
+    async def acquire(self, gh: "GitHubAPI", priority: int) -> None:
+        """Wait until the rate limit of gh has room for a request."""
+        deferred = False
+        while True:
+            rate_limit = self._rate_limit = gh.rate_limit
+            if (rate_limit is None or rate_limit.remaining is None
+                    or rate_limit.reset_datetime is None
+                    or rate_limit.remaining > self._floor(priority, rate_limit)):
+                break
+            wait = rate_limit.reset_datetime.timestamp() - time.time()
+            if wait <= 0:
+                break
+            if not deferred:
+                self.deferred[priority] += 1
+                deferred = True
+            self.waiting[priority] += 1
+            try:
+                await gh.sleep(wait + priority * self.write_delay)
+            finally:
+                self.waiting[priority] -= 1
+        self.granted[priority] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        rate_limit = self._rate_limit
+        stats: Dict[str, Any] = {
+            f"{name}_{key}": counts[priority]
+            for priority, name in _PRIORITY_NAMES.items()
+            for key, counts in (("waiting", self.waiting),
+                                ("deferred", self.deferred),
+                                ("granted", self.granted))}
+        if rate_limit is not None:
+            stats["limit"] = rate_limit.limit
+            stats["remaining"] = rate_limit.remaining
+            if rate_limit.reset_datetime is not None:
+                stats["reset_in"] = max(0.0, rate_limit.reset_datetime.timestamp()
+                                        - time.time())
+        return stats
+
+
+class _Circuit:
+
+    def __init__(self) -> None:
+        self.failures = 0
+        self.opened_at: Opt[float] = None
+
+
+class RetryPolicy:
+
+    """Retry failed requests and stop sending to hosts that keep failing.
+
+    Idempotent requests are retried after server errors and after the
+    'transient' exceptions the transport raises; other requests only when
+    the response carries a Retry-After header, as then GitHub did not act
+    on them. Retries back off exponentially from 'base' up to 'cap'
+    seconds with full jitter, or wait as long as Retry-After asks, up to
+    'max_retry_after' seconds.
+
+    After 'failure_threshold' failures in a row the circuit of a host
+    opens for 'recovery_time' seconds; a single failure afterwards opens it
+    again. While it is open, requests to the host wait for it to close
+    without opening a connection, or with 'wait_for_circuit' false raise
+    CircuitOpen at once. Waiting keeps a caller that makes several
+    requests from having to repeat the ones that already succeeded.
+    """
+
+    IDEMPOTENT = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+
+    def __init__(self, *, attempts: int = 3, base: float = 0.5,
+                 cap: float = 10.0, max_retry_after: float = 60.0,
+                 failure_threshold: int = 5, recovery_time: float = 30.0,
+                 wait_for_circuit: bool = True,
+                 transient: Tuple[type, ...] = (OSError, asyncio.TimeoutError)) -> None:
+        self.attempts = attempts
+        self.base = base
+        self.cap = cap
+        self.max_retry_after = max_retry_after
+        self.failure_threshold = failure_threshold
+        self.recovery_time = recovery_time
+        self.wait_for_circuit = wait_for_circuit
+        self.transient = transient
+        self._circuits: Dict[str, _Circuit] = {}
+        self.retries = 0
+        self.failed_fast = 0
+        self.circuit_waits = 0
+
+    def closes_in(self, host: str) -> float:
+        """Return the seconds until requests to host may be made again."""
+        circuit = self._circuits.get(host)
+        if circuit is None or circuit.opened_at is None:
+            return 0.0
+        return max(0.0, circuit.opened_at + self.recovery_time - time.monotonic())
+
+    def record(self, host: str, ok: bool) -> None:
+        circuit = self._circuits.setdefault(host, _Circuit())
+        if ok:
+            circuit.failures = 0
+            circuit.opened_at = None
+            return
+        circuit.failures += 1
+        if circuit.failures >= self.failure_threshold:
+            circuit.opened_at = time.monotonic()
+
+    def delay(self, method: str, attempt: int,
+              retry_after: Opt[str]) -> Opt[float]:
+        """Return the seconds to wait before retrying, or None to give up."""
+        if attempt + 1 >= self.attempts:
+            return None
+        if retry_after is not None:
+            seconds = _parse_retry_after(retry_after)
+            if seconds is None or seconds > self.max_retry_after:
+                return None
+            return seconds
+        if method not in self.IDEMPOTENT:
+            return None
+        return random.uniform(0, min(self.cap, self.base * 2 ** attempt))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "retries": self.retries,
+            "failed_fast": self.failed_fast,
+            "circuit_waits": self.circuit_waits,
+            "open_circuits": sorted(host for host, circuit in self._circuits.items()
+                                    if circuit.opened_at is not None),
+        }
+
+
+def _parse_retry_after(value: str) -> Opt[float]:
+    """Parse Retry-After given as seconds or as an HTTP date."""
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
 class GitHubAPI(abc.ABC):
 
     """Provide an idiomatic API for making calls to GitHub's API."""
 
     def __init__(self, requester: str, *, oauth_token: Opt[str] = None,
-                 cache: Opt[CACHE_TYPE] = None) -> None:
+                 cache: Opt[CACHE_TYPE] = None,
+                 scheduler: Opt[RateLimitScheduler] = None,
+                 retry_policy: Opt[RetryPolicy] = None) -> None:
         self.requester = requester
         self.oauth_token = oauth_token
         self._cache = cache
+        self.scheduler = scheduler
+        self.retry_policy = retry_policy
         self.rate_limit: Opt[sansio.RateLimit] = None
 
     @abc.abstractmethod
@@ -32,8 +213,17 @@ class GitHubAPI(abc.ABC):
         """Sleep for the specified number of seconds."""
 
     async def _make_request(self, method: str, url: str, url_vars: Dict,
-                            data: Any, accept: str) -> Tuple[bytes, Opt[str]]:
-        """Construct and make an HTTP request."""
+                            data: Any, accept: str,
+                            priority: Opt[int] = None) -> Tuple[bytes, Opt[str]]:
+        """Construct and make an HTTP request.
+
+        Without an explicit priority, GET requests are reads and everything
+        else a write.
+        """
+        if self.scheduler is not None:
+            if priority is None:
+                priority = READ if method == "GET" else WRITE
+            await self.scheduler.acquire(self, priority)
         filled_url = sansio.format_url(url, url_vars)
         request_headers = sansio.create_headers(self.requester, accept=accept,
                                                 oauth_token=self.oauth_token)
@@ -44,8 +234,14 @@ class GitHubAPI(abc.ABC):
             request_headers["content-length"] = "0"
             if method == "GET" and self._cache is not None:
                 cacheable = True
+                lookup = getattr(self._cache, "lookup", None)
                 try:
-                    etag, last_modified, data, more = self._cache[filled_url]
+                    if lookup is not None:
+                        # Only the validators; the body is decoded on a 304.
+                        entry = lookup(filled_url)
+                        etag, last_modified = entry.etag, entry.last_modified
+                    else:
+                        etag, last_modified, data, more = self._cache[filled_url]
                     cached = True
                 except KeyError:
                     pass
@@ -56,54 +252,117 @@ class GitHubAPI(abc.ABC):
                         request_headers["if-modified-since"] = last_modified
         else:
             charset = "utf-8"
-            body = json.dumps(data).encode(charset)
+            body = codec.get().dumps(data)
             request_headers['content-type'] = f"application/json; charset={charset}"
             request_headers['content-length'] = str(len(body))
         if self.rate_limit is not None and self.rate_limit.remaining is not None:
             self.rate_limit.remaining -= 1
-        response = await self._request(method, filled_url, request_headers, body)
-        if not (response[0] == 304 and cached):
+        response = await self._send(method, filled_url, request_headers, body)
+        if response[0] == 304 and cached:
+            if lookup is not None:
+                data, more = self._cache.revalidated(filled_url, entry)
+        else:
             data, self.rate_limit, more = sansio.decipher_response(*response)
             has_cache_details = ("etag" in response[1]
                                  or "last-modified" in response[1])
             if self._cache is not None and cacheable and has_cache_details:
                 etag = response[1].get("etag")
                 last_modified = response[1].get("last-modified")
-                self._cache[filled_url] = etag, last_modified, data, more
+                if lookup is not None:
+                    # The response bytes as they are; decoded again on a 304.
+                    self._cache.store(filled_url, etag, last_modified,
+                                      response[1].get("content-type"),
+                                      response[2], more)
+                else:
+                    self._cache[filled_url] = etag, last_modified, data, more
         return data, more
 
+    async def _send(self, method: str, url: str, headers: Mapping,
+                    body: bytes) -> Tuple[int, Mapping, bytes]:
+        """Make the request, retrying it as the retry policy allows.
+
+        The last response is returned even if it is an error, so it is
+        deciphered like any other.
+        """
+        policy = self.retry_policy
+        if policy is None:
+            return await self._request(method, url, headers, body)
+        host = urllib.parse.urlsplit(url).netloc
+        attempt = 0
+        while True:
+            closes_in = policy.closes_in(host)
+            if closes_in > 0:
+                if not policy.wait_for_circuit:
+                    policy.failed_fast += 1
+                    raise CircuitOpen(host, closes_in)
+                policy.circuit_waits += 1
+                await self.sleep(closes_in)
+            try:
+                response = await self._request(method, url, headers, body)
+            except policy.transient:
+                policy.record(host, ok=False)
+                delay = policy.delay(method, attempt, None)
+                if delay is None:
+                    raise
+            else:
+                status_code, response_headers, _ = response
+                retry_after = response_headers.get("retry-after")
+                # Being told to slow down is no sign of the host failing.
+                policy.record(host, ok=status_code < 500)
+                if status_code < 500 and not (status_code in {403, 429}
+                                              and retry_after is not None):
+                    return response
+                delay = policy.delay(method, attempt, retry_after)
+                if delay is None:
+                    return response
+            policy.retries += 1
+            await self.sleep(delay)
+            attempt += 1
+
     async def getitem(self, url: str, url_vars: Dict = {},
-                      *, accept: str = sansio.accept_format()) -> Any:
+                      *, accept: str = sansio.accept_format(),
+                      priority: Opt[int] = None) -> Any:
         """Send a GET request for a single item to the specified endpoint."""
-        data, _ = await self._make_request("GET", url, url_vars, b"", accept)
+        data, _ = await self._make_request("GET", url, url_vars, b"", accept,
+                                           priority)
         return data
 
     async def getiter(self, url: str, url_vars: Dict = {},
-                      *, accept: str = sansio.accept_format()) -> AsyncGenerator[Any, None]:
+                      *, accept: str = sansio.accept_format(),
+                      priority: Opt[int] = None) -> AsyncGenerator[Any, None]:
         """Return an async iterable for all the items at a specified endpoint."""
-        data, more = await self._make_request("GET", url, url_vars, b"", accept)
+        data, more = await self._make_request("GET", url, url_vars, b"", accept,
+                                              priority)
         for item in data:
             yield item
         if more:
             # `yield from` is not supported in coroutines.
-            async for item in self.getiter(more, url_vars, accept=accept):
+            async for item in self.getiter(more, url_vars, accept=accept,
+                                           priority=priority):
                 yield item
 
     async def post(self, url: str, url_vars: Dict = {}, *, data: Any,
-                   accept: str = sansio.accept_format()) -> Any:
-        data, _ = await self._make_request("POST", url, url_vars, data, accept)
+                   accept: str = sansio.accept_format(),
+                   priority: Opt[int] = None) -> Any:
+        data, _ = await self._make_request("POST", url, url_vars, data, accept,
+                                           priority)
         return data
 
     async def patch(self, url: str, url_vars: Dict = {}, *, data: Any,
-                    accept: str = sansio.accept_format()) -> Any:
-        data, _ = await self._make_request("PATCH", url, url_vars, data, accept)
+                    accept: str = sansio.accept_format(),
+                    priority: Opt[int] = None) -> Any:
+        data, _ = await self._make_request("PATCH", url, url_vars, data, accept,
+                                           priority)
         return data
 
     async def put(self, url: str, url_vars: Dict = {}, *, data: Any = b"",
-                  accept: str = sansio.accept_format()) -> Any:
-        data, _ = await self._make_request("PUT", url, url_vars, data, accept)
+                  accept: str = sansio.accept_format(),
+                  priority: Opt[int] = None) -> Any:
+        data, _ = await self._make_request("PUT", url, url_vars, data, accept,
+                                           priority)
         return data
 
     async def delete(self, url: str, url_vars: Dict = {}, *, data: Any = b"",
-                     accept: str = sansio.accept_format()) -> None:
-        await self._make_request("DELETE", url, url_vars, data, accept)
+                     accept: str = sansio.accept_format(),
+                     priority: Opt[int] = None) -> None:
+        await self._make_request("DELETE", url, url_vars, data, accept, priority)
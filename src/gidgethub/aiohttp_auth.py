@@ -7,31 +7,156 @@ import jwt
 
 from . import abc as gh_abc
 from config import config
+from metrics import Timing
+import utils
 
 # Custom version of gidgethub's aiohttp that will handle token refresh
 
+
+class ConnectionStats:
+
+    """Count how often requests reuse pooled connections."""
+
+    def __init__(self) -> None:
+        self.requests = 0
+        self.created = 0
+        self.reused = 0
+        self.dns_cache_hits = 0
+        self.dns_cache_misses = 0
+
+    def trace_config(self) -> aiohttp.TraceConfig:
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_request_start.append(self._count('requests'))
+        # Every new connection to GitHub costs a TCP and TLS handshake.
+        trace_config.on_connection_create_end.append(self._count('created'))
+        trace_config.on_connection_reuseconn.append(self._count('reused'))
+        trace_config.on_dns_cache_hit.append(self._count('dns_cache_hits'))
+        trace_config.on_dns_cache_miss.append(self._count('dns_cache_misses'))
+        return trace_config
+
+    def _count(self, name: str):
+        async def count(session, context, params):
+            setattr(self, name, getattr(self, name) + 1)
+        return count
+
+    def as_dict(self) -> dict:
+        connections = self.created + self.reused
+        return {
+            'requests': self.requests,
+            'connections_created': self.created,
+            'connections_reused': self.reused,
+            'reuse_rate': self.reused / connections if connections else 0.0,
+            'dns_cache_hits': self.dns_cache_hits,
+            'dns_cache_misses': self.dns_cache_misses,
+        }
+
+
 class GitHubAPI(gh_abc.GitHubAPI):
 
-    def __init__(self, *args: Any, **kwargs: Any) -> None:
+    def __init__(self, *args: Any, limit_per_host: int = 10, keepalive_timeout: float = 30.0,
+                 ttl_dns_cache: int = 300, **kwargs: Any) -> None:
         self.token = None
         self.token_expires_at = None
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.ttl_dns_cache = ttl_dns_cache
+        self.connection_stats = ConnectionStats()
+        self._session = None
+        # Shared by every caller waiting for the token being minted.
+        self._refreshing = None
+        self._refresher = None
+        self.refresh_time = Timing()
+        self.refresh_failures = 0
         super().__init__(*args, **kwargs)
 
+    def _get_session(self) -> aiohttp.ClientSession:
+        # Created on first use so it belongs to the running loop; shared by
+        # every request so connections to GitHub are kept alive and reused.
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit_per_host=self.limit_per_host,
+                                             keepalive_timeout=self.keepalive_timeout,
+                                             ttl_dns_cache=self.ttl_dns_cache)
+            self._session = aiohttp.ClientSession(
+                connector=connector, trace_configs=[self.connection_stats.trace_config()])
+        return self._session
+
+    async def close(self) -> None:
+        if self._refresher is not None:
+            self._refresher.cancel()
+            await asyncio.gather(self._refresher, return_exceptions=True)
+            self._refresher = None
+        if self._session is not None:
+            await self._session.close()
+
     async def check(self):
-        await self._refresh_token()
+        await self._refresh()
+
+    def _token_valid_for(self) -> float:
+        if self.token is None or self.token_expires_at is None:
+            return 0.0
+        return (self.token_expires_at - datetime.datetime.utcnow()).total_seconds()
+
+    async def _refresh(self) -> None:
+        """Mint a new token, or wait for the one already being minted."""
+        if self._refreshing is None:
+            self._refreshing = asyncio.ensure_future(self._timed_refresh())
+            self._refreshing.add_done_callback(self._refreshed)
+        # Shielded so a cancelled caller does not cancel it for the others.
+        await asyncio.shield(self._refreshing)
+
+    def _refreshed(self, future: asyncio.Future) -> None:
+        self._refreshing = None
+
+    async def _timed_refresh(self) -> None:
+        started = asyncio.get_event_loop().time()
+        try:
+            await self._refresh_token()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self.refresh_failures += 1
+            raise
+        finally:
+            self.refresh_time.observe(asyncio.get_event_loop().time() - started)
+
+    def start_refresher(self, margin: float = 300.0) -> None:
+        """Renew the token in the background margin seconds before it expires."""
+        if self._refresher is None:
+            self._refresher = asyncio.ensure_future(self._refresh_ahead(margin))
+
+    async def _refresh_ahead(self, margin: float) -> None:
+        delays = None
+        while True:
+            await asyncio.sleep(max(0.0, self._token_valid_for() - margin))
+            try:
+                await self._refresh()
+                delays = None
+            except asyncio.CancelledError:
+                # An Exception before Python 3.8, and close() is waiting on it.
+                raise
+            except Exception:
+                # Retry soon while the current token, if any, is still good
+                if delays is None:
+                    delays = utils.backoff_delays(1.0, 60.0)
+                await asyncio.sleep(next(delays))
+
+    def token_stats(self) -> dict:
+        return {
+            'valid_for': max(0.0, self._token_valid_for()),
+            'refreshes': self.refresh_time.stats(),
+            'failures': self.refresh_failures,
+        }
 
     async def _request(self, method: str, url: str, headers: Mapping,
                        body: bytes = b'') -> Tuple[int, Mapping, bytes]:
-        now = datetime.datetime.utcnow()
-        token_expired = self.token_expires_at is not None and (self.token_expires_at - now).total_seconds() < 60
-        if self.token is None or token_expired:
-            await self._refresh_token()
+        # Normally the background refresher renewed the token long ago
+        if self._token_valid_for() < 60:
+            await self._refresh()
 
         headers['authorization'] = f'token {self.token}'
-        async with aiohttp.ClientSession() as session:
-            async with session.request(method, url, headers=headers,
-                                         data=body) as response:
-                return response.status, response.headers, await response.read()
+        async with self._get_session().request(method, url, headers=headers,
+                                               data=body) as response:
+            return response.status, response.headers, await response.read()
 
     async def sleep(self, seconds: float) -> None:
         await asyncio.sleep(seconds)
@@ -44,17 +169,16 @@ class GitHubAPI(gh_abc.GitHubAPI):
             'iss': config.github_app_id,
         }, config.github_app_private_key, algorithm='RS256')
 
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                    url=f'{config.github_uri}/api/v3/installations/{config.github_app_installation_id}/access_tokens',
-                    headers={
-                        'Accept': self._accept_types(),
-                        'Authorization': f'Bearer {encoded_jwt.decode()}',
-                    }
-            ) as response:
-                data = await response.json()
-                self.token = data['token']
-                self.token_expires_at = datetime.datetime.strptime(data['expires_at'], '%Y-%m-%dT%H:%M:%SZ')
+        async with self._get_session().post(
+                url=f'{config.github_uri}/api/v3/installations/{config.github_app_installation_id}/access_tokens',
+                headers={
+                    'Accept': self._accept_types(),
+                    'Authorization': f'Bearer {encoded_jwt.decode()}',
+                }
+        ) as response:
+            data = await response.json()
+            self.token = data['token']
+            self.token_expires_at = datetime.datetime.strptime(data['expires_at'], '%Y-%m-%dT%H:%M:%SZ')
 
     def _accept_types(self):
         accept_types = [
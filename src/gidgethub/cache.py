@@ -0,0 +1,157 @@
+"""A response cache for conditional requests bounded by bytes.
+
+Entries keep the raw bytes and content type of the response they came
+from. The validators of an entry are stored apart from its body, so a
+conditional request can be made without decoding anything; the body is
+only decoded when GitHub answers 304. Least recently used entries are evicted once the total size goes over
+the limit, and entries expire after a time to live.
+"""
+import collections
+import collections.abc
+import time
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from . import codec
+from . import sansio
+
+# Value represents etag, last-modified, data, and next page.
+Entry = Tuple[Optional[str], Optional[str], Any, Optional[str]]
+
+# Rough bytes of bookkeeping per entry, on top of its key and body.
+_OVERHEAD = 200
+
+
+class _Stored:
+
+    __slots__ = ("etag", "last_modified", "more", "content_type", "body",
+                 "expires", "size")
+
+
+class ResponseCache(collections.abc.MutableMapping):
+
+    """Map URLs to cached responses, holding at most 'max_bytes' of them.
+
+    Entries live 'ttl' seconds unless store() or set() gives them their own.
+    """
+
+    def __init__(self, max_bytes: int, *, ttl: float = 3600.0) -> None:
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.size = 0
+        self._entries: "collections.OrderedDict[str, _Stored]" = collections.OrderedDict()
+        # A hit is a lookup that found validators to send and a miss one
+        # that found nothing; a revalidation is a 304 answered from the cache.
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _live(self, url: str) -> Optional[_Stored]:
+        stored = self._entries.get(url)
+        if stored is not None and stored.expires <= time.monotonic():
+            self._remove(url)
+            self.expirations += 1
+            stored = None
+        return stored
+
+    def _decode(self, stored: _Stored) -> Any:
+        return sansio._decode_body(stored.content_type, stored.body)
+
+    def lookup(self, url: str) -> _Stored:
+        """Return the entry for url without decoding its body.
+
+        Its etag and last_modified attributes are the validators for a
+        conditional request. KeyError is raised if there is no entry.
+        """
+        stored = self._live(url)
+        if stored is None:
+            self.misses += 1
+            raise KeyError(url)
+        self.hits += 1
+        self._entries.move_to_end(url)
+        return stored
+
+    def revalidated(self, url: str, stored: _Stored) -> Tuple[Any, Optional[str]]:
+        """Return the data and next page of an entry GitHub confirmed with a 304.
+
+        The entry is renewed if it is still cached.
+        """
+        self.revalidations += 1
+        if self._entries.get(url) is stored:
+            stored.expires = time.monotonic() + self.ttl
+        return self._decode(stored), stored.more
+
+    def __getitem__(self, url: str) -> Entry:
+        stored = self._live(url)
+        if stored is None:
+            raise KeyError(url)
+        self._entries.move_to_end(url)
+        return stored.etag, stored.last_modified, self._decode(stored), stored.more
+
+    def __contains__(self, url: object) -> bool:
+        stored = self._entries.get(url)  # type: ignore
+        return stored is not None and stored.expires > time.monotonic()
+
+    def __setitem__(self, url: str, entry: Entry) -> None:
+        self.set(url, entry)
+
+    def set(self, url: str, entry: Entry, ttl: Optional[float] = None) -> None:
+        """Cache entry for url, for ttl seconds instead of the default."""
+        etag, last_modified, data, more = entry
+        # Diffs and other raw media types are decoded as text.
+        if isinstance(data, str):
+            content_type, body = "text/plain; charset=utf-8", data.encode("utf-8")
+        else:
+            content_type, body = "application/json; charset=utf-8", codec.get().dumps(data)
+        self.store(url, etag, last_modified, content_type, body, more, ttl)
+
+    def store(self, url: str, etag: Optional[str], last_modified: Optional[str],
+              content_type: Optional[str], body: bytes, more: Optional[str],
+              ttl: Optional[float] = None) -> None:
+        """Cache the raw body of a response for url.
+
+        The body is decoded according to content_type when it is used.
+        """
+        stored = _Stored()
+        stored.etag = etag
+        stored.last_modified = last_modified
+        stored.more = more
+        stored.content_type = content_type
+        stored.body = bytes(body)
+        stored.expires = time.monotonic() + (self.ttl if ttl is None else ttl)
+        stored.size = len(stored.body) + len(url) + _OVERHEAD
+        if url in self._entries:
+            self._remove(url)
+        if stored.size > self.max_bytes:
+            return
+        self._entries[url] = stored
+        self.size += stored.size
+        while self.size > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _remove(self, url: str) -> None:
+        self.size -= self._entries.pop(url).size
+
+    def __delitem__(self, url: str) -> None:
+        self._remove(url)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._entries)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "bytes": self.size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "revalidations": self.revalidations,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
@@ -0,0 +1,74 @@
+"""JSON codecs for request and response bodies.
+
+The standard library is always available; faster libraries are used when
+they are installed. Every codec decodes UTF-8 bytes directly, so bodies do
+not have to be copied into a str first, and encodes straight to bytes.
+"""
+import json
+from typing import Any, Callable
+
+
+class Codec:
+
+    """Functions to decode JSON from and encode JSON to bytes."""
+
+    def __init__(self, name: str, loads: Callable[[bytes], Any],
+                 dumps: Callable[[Any], bytes]) -> None:
+        self.name = name
+        self.loads = loads
+        self.dumps = dumps
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__} {self.name!r}>"
+
+
+def _stdlib() -> Codec:
+    return Codec("json", json.loads, lambda data: json.dumps(data).encode("utf-8"))
+
+
+def _orjson() -> Codec:
+    import orjson
+    return Codec("orjson", orjson.loads, orjson.dumps)
+
+
+def _ujson() -> Codec:
+    import ujson
+    return Codec("ujson", ujson.loads,
+                 lambda data: ujson.dumps(data, ensure_ascii=False).encode("utf-8"))
+
+
+# Fastest first, which is the order "auto" tries them in.
+CODECS = {"orjson": _orjson, "ujson": _ujson, "json": _stdlib}
+
+
+def load(name: str = "auto") -> Codec:
+    """Return the named codec, or the fastest installed one for "auto".
+
+    ImportError is raised if the library behind the codec is not installed
+    and ValueError if there is no codec by that name.
+    """
+    if name == "auto":
+        for factory in CODECS.values():
+            try:
+                return factory()
+            except ImportError:
+                pass
+    try:
+        factory = CODECS[name]
+    except KeyError:
+        raise ValueError(f"unknown JSON codec: {name!r}")
+    return factory()
+
+
+_codec = _stdlib()
+
+
+def get() -> Codec:
+    """Return the codec bodies are encoded and decoded with."""
+    return _codec
+
+
+def use(codec: Codec) -> None:
+    """Encode and decode bodies with codec from now on."""
+    global _codec
+    _codec = codec
@@ -1,20 +1,60 @@
-from typing import Any, Awaitable, Callable, Dict, List, Optional
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, FrozenSet, List, Optional, Tuple
 
+from . import DispatchError
 from . import sansio
 
 
 AsyncCallback = Callable[..., Awaitable[None]]
+# Callbacks for any data, then data key -> data value -> callbacks.
+DispatchEntry = Tuple[Tuple[AsyncCallback, ...],
+                      Tuple[Tuple[str, Dict[Any, Tuple[AsyncCallback, ...]]], ...]]
+
+
+class CallbackStats:
+
+    """Call counts and latency of a callback."""
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float, failed: bool) -> None:
+        self.calls += 1
+        self.errors += failed
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def as_dict(self) -> Dict[str, Any]:
+        mean = self.total / self.calls if self.calls else 0.0
+        return {"calls": self.calls, "errors": self.errors,
+                "mean": mean, "max": self.max}
 
 
 class Router:
 
     """Route webhook events to registered functions."""
 
-    def __init__(self, *other_routers: "Router") -> None:
-        """Instantiate a new router (possibly from other routers)."""
+    def __init__(self, *other_routers: "Router", concurrent: bool = False,
+                 timeout: Optional[float] = None) -> None:
+        """Instantiate a new router (possibly from other routers).
+
+        With 'concurrent', the callbacks matching an event run at the same
+        time and the failure of one does not stop the others; all failures
+        are raised together as DispatchError. A 'timeout' limits how many
+        seconds each callback may run.
+        """
+        self.concurrent = concurrent
+        self.timeout = timeout
         self._shallow_routes: Dict[str, List[AsyncCallback]] = {}
         # event type -> data key -> data value -> callbacks
         self._deep_routes: Dict[str, Dict[str, Dict[Any, List[AsyncCallback]]]] = {}
+        # Immutable snapshot of the routes for dispatch, rebuilt on add().
+        self._dispatch_table: Dict[str, DispatchEntry] = {}
+        self._stats: Dict[str, CallbackStats] = {}
         for other_router in other_routers:
             for event_type, callbacks in other_router._shallow_routes.items():
                 for callback in callbacks:
@@ -48,6 +88,15 @@ class Router:
             specific_detail = data_details.setdefault(data_key, {})
             callbacks = specific_detail.setdefault(data_value, [])
             callbacks.append(func)
+        self._dispatch_table[event_type] = self._dispatch_entry(event_type)
+
+    def _dispatch_entry(self, event_type: str) -> DispatchEntry:
+        shallow = tuple(self._shallow_routes.get(event_type, ()))
+        deep = tuple((data_key, {data_value: tuple(callbacks)
+                                 for data_value, callbacks in data_values.items()})
+                     for data_key, data_values
+                     in self._deep_routes.get(event_type, {}).items())
+        return shallow, deep
 
     def register(self, event_type: str,
                  **data_detail: Any) -> Callable[[AsyncCallback], AsyncCallback]:
@@ -57,24 +106,67 @@ class Router:
             return func
         return decorator
 
+    def event_types(self) -> FrozenSet[str]:
+        """Return the event types at least one function is registered for."""
+        return frozenset(self._shallow_routes) | frozenset(self._deep_routes)
+
+    def actions(self, event_type: str) -> Optional[FrozenSet[Any]]:
+        """Return the actions of event_type that functions are registered for.
+
+        None is returned when a function is registered for the event type
+        regardless of its action, so every action is of interest.
+        """
+        if event_type in self._shallow_routes:
+            return None
+        details = self._deep_routes.get(event_type, {})
+        if any(data_key != "action" for data_key in details):
+            return None
+        return frozenset(details.get("action", ()))
+
+    def callback_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Return the call counts and latency of every callback dispatched to."""
+        return {name: stats.as_dict() for name, stats in self._stats.items()}
+
+    async def _call(self, callback: AsyncCallback, event: sansio.Event,
+                    *args: Any, **kwargs: Any) -> None:
+        name = getattr(callback, "__qualname__", repr(callback))
+        stats = self._stats.get(name)
+        if stats is None:
+            stats = self._stats[name] = CallbackStats()
+        started = time.monotonic()
+        failed = True
+        try:
+            if self.timeout is None:
+                await callback(event, *args, **kwargs)
+            else:
+                await asyncio.wait_for(callback(event, *args, **kwargs),
+                                       self.timeout)
+            failed = False
+        finally:
+            stats.observe(time.monotonic() - started, failed)
+
     async def dispatch(self, event: sansio.Event, *args: Any,
                        **kwargs: Any) -> None:
         """Dispatch an event to all registered function(s)."""
-
-        found_callbacks = []
-        try:
-            found_callbacks.extend(self._shallow_routes[event.event])
-        except KeyError:
-            pass
         try:
-            details = self._deep_routes[event.event]
+            shallow, deep = self._dispatch_table[event.event]
         except KeyError:
-            pass
-        else:
-            for data_key, data_values in details.items():
-                if data_key in event.data:
-                    event_value = event.data[data_key]
-                    if event_value in data_values:
-                        found_callbacks.extend(data_values[event_value])
-        for callback in found_callbacks:
-            await callback(event, *args, **kwargs)
+            return
+        found_callbacks = shallow
+        for data_key, data_values in deep:
+            if data_key in event.data:
+                event_value = event.data[data_key]
+                if event_value in data_values:
+                    found_callbacks += data_values[event_value]
+
+        if not self.concurrent:
+            for callback in found_callbacks:
+                await self._call(callback, event, *args, **kwargs)
+            return
+        results = await asyncio.gather(
+            *(self._call(callback, event, *args, **kwargs)
+              for callback in found_callbacks),
+            return_exceptions=True)
+        errors = [result for result in results if isinstance(result, Exception)]
+        if errors:
+            raise DispatchError(errors)
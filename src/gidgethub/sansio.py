@@ -10,13 +10,13 @@ import datetime
 import hashlib
 import hmac
 import http
-import json
 import re
 from typing import Any, Dict, Mapping, Optional, Tuple, Type
 import urllib.parse
 
 import uritemplate
 
+from . import codec
 from . import (BadRequest, GitHubBroken, HTTPException, InvalidField,
                RateLimitExceeded, RedirectionException, ValidationFailure)
 from config import config
@@ -48,28 +48,53 @@ def _decode_body(content_type: Optional[str], body: bytes,
     type_, encoding = _parse_content_type(content_type)
     if not len(body) or not content_type:
         return None
+    if type_ == "application/json" and encoding.lower() in {"utf-8", "utf8"}:
+        # Codecs take UTF-8 bytes as they are, without a decoded copy.
+        return codec.get().loads(body)
     decoded_body = body.decode(encoding)
     if type_ == "application/json":
-        return json.loads(decoded_body)
+        return codec.get().loads(decoded_body)
     elif type_ == "application/x-www-form-urlencoded":
-        return json.loads(urllib.parse.parse_qs(decoded_body)["payload"][0])
+        return codec.get().loads(urllib.parse.parse_qs(decoded_body)["payload"][0])
     elif strict:
         raise ValueError(f"unrecognized content type: {type_!r}")
     return decoded_body
 
 
+class EventValidator:
+
+    """Validate the signature of a webhook event while its body arrives.
+
+    The body is fed in chunks to update() and verify() then checks the
+    signature, so the body does not have to be hashed in a second pass.
+    """
+
+    def __init__(self, *, signature: str, secret: str) -> None:
+        # https://developer.github.com/webhooks/securing/#validating-payloads-from-github
+        signature_prefix = "sha1="
+        if not signature.startswith(signature_prefix):
+            raise ValidationFailure("signature does not start with "
+                                               f"{repr(signature_prefix)}")
+        self._signature = signature
+        self._hmac = hmac.new(secret.encode("UTF-8"), digestmod="sha1")
+
+    def update(self, chunk: bytes) -> None:
+        """Add the next chunk of the payload."""
+        self._hmac.update(chunk)
+
+    def verify(self) -> None:
+        """Raise ValidationFailure if the payload does not match the signature."""
+        calculated_sig = "sha1=" + self._hmac.hexdigest()
+        if not hmac.compare_digest(self._signature, calculated_sig):
+            raise ValidationFailure("payload's signature does not align "
+                                               "with the secret")
+
+
 def validate_event(payload: bytes, *, signature: str, secret: str) -> None:
     """Validate the signature of a webhook event."""
-    # https://developer.github.com/webhooks/securing/#validating-payloads-from-github
-    signature_prefix = "sha1="
-    if not signature.startswith(signature_prefix):
-        raise ValidationFailure("signature does not start with "
-                                           f"{repr(signature_prefix)}")
-    hmac_ = hmac.new(secret.encode("UTF-8"), msg=payload, digestmod="sha1")
-    calculated_sig = signature_prefix + hmac_.hexdigest()
-    if not hmac.compare_digest(signature, calculated_sig):
-        raise ValidationFailure("payload's signature does not align "
-                                           "with the secret")
+    validator = EventValidator(signature=signature, secret=secret)
+    validator.update(payload)
+    validator.verify()
 
 
 class Event:
@@ -89,7 +114,8 @@ class Event:
 
     @classmethod
     def from_http(cls, headers: Mapping, body: bytes,
-                  *, secret: Optional[str] = None) -> "Event":
+                  *, secret: Optional[str] = None,
+                  validator: Optional[EventValidator] = None) -> "Event":
         """Construct an event from HTTP headers and JSON body data.
 
         The mapping providing the headers is expected to support lowercase keys.
@@ -103,12 +129,19 @@ class Event:
         will be performed unconditionally. Any failure in validation
         (including not providing a secret) will lead to ValidationFailure being
         raised.
+
+        If the body was already fed to an EventValidator while it was read,
+        that validator is verified instead of hashing the body again. The
+        body may be any bytes-like object.
         """
         if "x-hub-signature" in headers:
                 if secret is None:
                     raise ValidationFailure("secret not provided")
-                validate_event(body, signature=headers["x-hub-signature"],
-                               secret=secret)
+                if validator is None:
+                    validate_event(body, signature=headers["x-hub-signature"],
+                                   secret=secret)
+                else:
+                    validator.verify()
         elif secret is not None:
             raise ValidationFailure("signature is missing")
 
@@ -5,7 +5,7 @@ import types
 
 import pytest
 
-from .. import RedirectionException
+from .. import BadRequest, CircuitOpen, GitHubBroken, RedirectionException
 from .. import abc as gh_abc
 from .. import sansio
 
@@ -17,11 +17,12 @@ class MockGitHubAPI(gh_abc.GitHubAPI):
                        "content-type": "application/json"}
 
     def __init__(self, status_code=200, headers=DEFAULT_HEADERS, body=b'', *,
-                 cache=None):
+                 cache=None, scheduler=None, retry_policy=None):
         self.response_code = status_code
         self.response_headers = headers
         self.response_body = body
-        super().__init__("test_abc", oauth_token="oauth token", cache=cache)
+        super().__init__("test_abc", oauth_token="oauth token", cache=cache,
+                         scheduler=scheduler, retry_policy=retry_policy)
 
     async def _request(self, method, url, headers, body=b''):
         """Make an HTTP request."""
@@ -288,3 +289,170 @@ class TestCache:
         headers["last-modified"] = "54321"
         gh = MockGitHubAPI(headers=headers)
         await gh.getitem("/fake")  # No exceptions raised.
+
+
+class RateLimitedGitHubAPI(MockGitHubAPI):
+
+    """Starts out of requests; sleeping past the reset restores them."""
+
+    def __init__(self, remaining=0, **kwargs):
+        super().__init__(**kwargs)
+        reset = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(hours=1)
+        self.rate_limit = sansio.RateLimit(limit=100, remaining=remaining,
+                                           reset_epoch=reset.timestamp())
+        self.sleeps = []
+
+    async def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.rate_limit = sansio.RateLimit(limit=100, remaining=100,
+                                           reset_epoch=0)
+
+
+@pytest.mark.asyncio
+async def test_scheduler_without_rate_limit():
+    gh = MockGitHubAPI(scheduler=gh_abc.RateLimitScheduler())
+    await gh.getitem("/fake")
+    assert gh.scheduler.granted == {gh_abc.READ: 1, gh_abc.WRITE: 0}
+
+
+@pytest.mark.asyncio
+async def test_scheduler_defers_when_exhausted():
+    scheduler = gh_abc.RateLimitScheduler(write_delay=5)
+    gh = RateLimitedGitHubAPI(scheduler=scheduler)
+    await gh.getitem("/fake")
+    assert len(gh.sleeps) == 1
+    assert 3500 < gh.sleeps[0] <= 3600
+    assert scheduler.deferred[gh_abc.READ] == 1
+
+    gh = RateLimitedGitHubAPI(scheduler=scheduler)
+    await gh.post("/fake", data={})
+    # Writes wait a little longer than reads deferred with them.
+    assert 3505 < gh.sleeps[0] <= 3605
+    assert scheduler.deferred[gh_abc.WRITE] == 1
+    assert scheduler.waiting == {gh_abc.READ: 0, gh_abc.WRITE: 0}
+
+
+@pytest.mark.asyncio
+async def test_scheduler_reserves_for_reads():
+    scheduler = gh_abc.RateLimitScheduler(write_reserve=0.1)
+    gh = RateLimitedGitHubAPI(remaining=10, scheduler=scheduler)
+    await gh.getitem("/fake")
+    assert not gh.sleeps
+
+    gh = RateLimitedGitHubAPI(remaining=10, scheduler=scheduler)
+    await gh.post("/fake", data={})
+    assert len(gh.sleeps) == 1
+
+    # An explicit priority overrides the method.
+    gh = RateLimitedGitHubAPI(remaining=10, scheduler=scheduler)
+    await gh.post("/fake", data={}, priority=gh_abc.READ)
+    assert not gh.sleeps
+
+
+def test_scheduler_stats():
+    scheduler = gh_abc.RateLimitScheduler()
+    assert scheduler.stats()["write_waiting"] == 0
+
+
+class FlakyGitHubAPI(MockGitHubAPI):
+
+    """Answers with the queued responses, raising exceptions among them."""
+
+    def __init__(self, responses, **kwargs):
+        super().__init__(**kwargs)
+        self.responses = list(responses)
+        self.requests = 0
+        self.sleeps = []
+
+    async def _request(self, method, url, headers, body=b''):
+        self.requests += 1
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        status_code, headers = response
+        return status_code, dict(MockGitHubAPI.DEFAULT_HEADERS, **headers), b"1"
+
+    async def sleep(self, seconds):
+        self.sleeps.append(seconds)
+
+
+@pytest.mark.asyncio
+async def test_retry_idempotent():
+    policy = gh_abc.RetryPolicy(attempts=3, base=1, cap=2)
+    gh = FlakyGitHubAPI([(502, {}), ConnectionResetError(), (200, {})],
+                        retry_policy=policy)
+    assert await gh.getitem("/fake") == 1
+    assert gh.requests == 3
+    assert len(gh.sleeps) == 2
+    assert all(0 <= seconds <= 2 for seconds in gh.sleeps)
+    assert policy.retries == 2
+
+
+@pytest.mark.asyncio
+async def test_retry_gives_up():
+    gh = FlakyGitHubAPI([(502, {}), (502, {})],
+                        retry_policy=gh_abc.RetryPolicy(attempts=2))
+    with pytest.raises(GitHubBroken):
+        await gh.getitem("/fake")
+    assert gh.requests == 2
+
+
+@pytest.mark.asyncio
+async def test_no_retry_post():
+    gh = FlakyGitHubAPI([(502, {})], retry_policy=gh_abc.RetryPolicy())
+    with pytest.raises(GitHubBroken):
+        await gh.post("/fake", data={})
+    assert gh.requests == 1
+
+
+@pytest.mark.asyncio
+async def test_retry_after():
+    gh = FlakyGitHubAPI([(503, {"retry-after": "7"}), (201, {})],
+                        retry_policy=gh_abc.RetryPolicy())
+    assert await gh.post("/fake", data={}) == 1
+    assert gh.sleeps == [7]
+    # Waits longer than allowed are not retried.
+    gh = FlakyGitHubAPI([(429, {"retry-after": "3600"})],
+                        retry_policy=gh_abc.RetryPolicy(max_retry_after=60))
+    with pytest.raises(BadRequest):
+        await gh.getitem("/fake")
+    assert not gh.sleeps
+
+
+@pytest.mark.asyncio
+async def test_circuit_breaker_waits():
+    policy = gh_abc.RetryPolicy(attempts=1, failure_threshold=2,
+                                recovery_time=60)
+    gh = FlakyGitHubAPI([(500, {}), (500, {}), (201, {})],
+                        retry_policy=policy)
+    for _ in range(2):
+        with pytest.raises(GitHubBroken):
+            await gh.getitem("/fake")
+    assert not gh.sleeps
+    # The request waits for the circuit instead of failing.
+    assert await gh.post("/fake", data={}) == 1
+    assert len(gh.sleeps) == 1
+    assert 0 < gh.sleeps[0] <= 60
+    assert policy.stats()["circuit_waits"] == 1
+    assert policy.stats()["open_circuits"] == []
+
+
+@pytest.mark.asyncio
+async def test_circuit_breaker():
+    policy = gh_abc.RetryPolicy(attempts=1, failure_threshold=2,
+                                recovery_time=60, wait_for_circuit=False)
+    gh = FlakyGitHubAPI([(500, {}), (500, {}), (200, {})],
+                        retry_policy=policy)
+    for _ in range(2):
+        with pytest.raises(GitHubBroken):
+            await gh.getitem("/fake")
+    with pytest.raises(CircuitOpen) as exc_info:
+        await gh.getitem("/fake")
+    assert exc_info.value.host == "api.github.com"
+    assert 0 < exc_info.value.retry_in <= 60
+    assert gh.requests == 2
+    assert policy.stats()["open_circuits"] == ["api.github.com"]
+
+    policy.recovery_time = 0
+    assert await gh.getitem("/fake") == 1
+    assert policy.stats()["open_circuits"] == []
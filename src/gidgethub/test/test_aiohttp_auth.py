@@ -0,0 +1,139 @@
+import asyncio
+import datetime
+
+import pytest
+
+from .. import aiohttp_auth as gh_aiohttp
+
+
+class FakeResponse:
+
+    status = 200
+    headers = {"content-type": "application/json"}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        pass
+
+    async def read(self):
+        return b"{}"
+
+
+class FakeSession:
+
+    def __init__(self):
+        self.authorizations = []
+
+    def request(self, method, url, headers, data):
+        self.authorizations.append(headers["authorization"])
+        return FakeResponse()
+
+    async def close(self):
+        pass
+
+
+class FakeGitHubAPI(gh_aiohttp.GitHubAPI):
+
+    """Mint tokens without GitHub; each refresh waits for 'release'."""
+
+    def __init__(self, valid_for=3600):
+        super().__init__("test_aiohttp_auth")
+        self.valid_for = valid_for
+        self.release = asyncio.Event()
+        self.refreshes = 0
+        self.fail = False
+        self._session = FakeSession()
+
+    def _get_session(self):
+        return self._session
+
+    async def _refresh_token(self):
+        self.refreshes += 1
+        await self.release.wait()
+        if self.fail:
+            raise RuntimeError("GitHub said no")
+        self.token = f"token-{self.refreshes}"
+        self.token_expires_at = (datetime.datetime.utcnow()
+                                 + datetime.timedelta(seconds=self.valid_for))
+
+
+@pytest.mark.asyncio
+async def test_concurrent_requests_refresh_once():
+    gh = FakeGitHubAPI()
+    requests = [gh._request("GET", "https://api.github.com/fake", {}) for _ in range(5)]
+    tasks = [asyncio.ensure_future(request) for request in requests]
+    await asyncio.sleep(0.01)
+    gh.release.set()
+    responses = await asyncio.gather(*tasks)
+    assert [status for status, _, _ in responses] == [200] * 5
+    assert gh.refreshes == 1
+    assert gh._session.authorizations == ["token token-1"] * 5
+    # A token that is still good is not refreshed again.
+    await gh._request("GET", "https://api.github.com/fake", {})
+    assert gh.refreshes == 1
+
+
+@pytest.mark.asyncio
+async def test_failed_refresh_shared():
+    gh = FakeGitHubAPI()
+    gh.fail = True
+    gh.release.set()
+    results = await asyncio.gather(gh._refresh(), gh._refresh(), return_exceptions=True)
+    assert [type(result) for result in results] == [RuntimeError, RuntimeError]
+    assert gh.refreshes == 1
+    assert gh.token_stats()["failures"] == 1
+    # The next caller tries again.
+    gh.fail = False
+    await gh._refresh()
+    assert gh.refreshes == 2
+
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_keeps_refresh():
+    gh = FakeGitHubAPI()
+    cancelled = asyncio.ensure_future(gh._refresh())
+    waiting = asyncio.ensure_future(gh._refresh())
+    await asyncio.sleep(0.01)
+    cancelled.cancel()
+    await asyncio.sleep(0.01)
+    assert gh._refreshing is not None and not gh._refreshing.done()
+    gh.release.set()
+    await waiting
+    assert cancelled.cancelled()
+    assert gh.token == "token-1"
+    assert gh.refreshes == 1
+
+
+@pytest.mark.asyncio
+async def test_refresher_renews_ahead():
+    gh = FakeGitHubAPI(valid_for=0.3)
+    gh.release.set()
+    gh.start_refresher(margin=0.1)
+    try:
+        # No token yet, so one is minted right away, then renewed 0.1s
+        # before it expires, at 0.2s.
+        await asyncio.sleep(0.05)
+        assert gh.refreshes == 1
+        await asyncio.sleep(0.2)
+        assert gh.refreshes == 2
+    finally:
+        await gh.close()
+
+
+@pytest.mark.asyncio
+async def test_close_stops_refresher():
+    gh = FakeGitHubAPI()
+    gh.start_refresher()
+    refresher = gh._refresher
+    await asyncio.sleep(0.01)
+    await asyncio.wait_for(gh.close(), 1)
+    assert refresher.cancelled()
+    assert gh._refresher is None
+    # The refresh it was waiting on is left alone.
+    assert gh.refreshes == 1
+    gh.release.set()
+    await gh._refresh()
+    assert gh.refreshes == 1
+    assert gh.token == "token-1"
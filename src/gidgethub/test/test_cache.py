@@ -0,0 +1,126 @@
+import pytest
+
+from gidgethub import cache as gh_cache
+
+from .test_abc import MockGitHubAPI
+
+
+def test_round_trip():
+    cache = gh_cache.ResponseCache(1024 * 1024)
+    data = {"number": 1, "title": "x" * 500, "labels": []}
+    diff = "+added line\n" * 100
+    cache["json"] = "etag", None, data, "next"
+    cache["diff"] = None, "yesterday", diff, None
+    cache["small"] = "etag", None, [1, 2], None
+    assert cache["json"] == ("etag", None, data, "next")
+    assert cache["diff"] == (None, "yesterday", diff, None)
+    assert cache["small"] == ("etag", None, [1, 2], None)
+
+
+def test_store_raw():
+    cache = gh_cache.ResponseCache(1024)
+    body = b'{"number": 1}'
+    cache.store("json", "etag", None, "application/json; charset=utf-8", body, None)
+    cache.store("diff", "etag", None, "application/vnd.github.v3.diff; charset=utf-8",
+                b"+added line\n", None)
+    assert cache.lookup("json").body is body
+    assert cache["json"] == ("etag", None, {"number": 1}, None)
+    assert cache["diff"] == ("etag", None, "+added line\n", None)
+
+
+def test_miss():
+    cache = gh_cache.ResponseCache(1024)
+    with pytest.raises(KeyError):
+        cache["missing"]
+    with pytest.raises(KeyError):
+        cache.lookup("missing")
+    assert cache.stats()["misses"] == 1
+
+
+def test_contains_keeps_order():
+    cache = gh_cache.ResponseCache(2000)
+    cache["a"] = None, None, "x" * 500, None
+    cache["b"] = None, None, "x" * 500, None
+    assert "a" in cache
+    assert "missing" not in cache
+    cache["c"] = None, None, "x" * 500, None
+    # Membership tests do not count as use.
+    assert "a" not in cache
+
+
+def test_evicts_by_bytes():
+    cache = gh_cache.ResponseCache(3000)
+    for index in range(5):
+        cache[str(index)] = None, None, "x" * 800, None
+    assert cache.size <= 3000
+    assert "0" not in cache
+    assert "4" in cache
+    assert cache.stats()["evictions"] == 3
+    # Entries larger than the whole cache are not stored.
+    cache["huge"] = None, None, "x" * 5000, None
+    assert "huge" not in cache
+
+
+def test_lru_order():
+    cache = gh_cache.ResponseCache(2000)
+    cache["a"] = None, None, "x" * 500, None
+    cache["b"] = None, None, "x" * 500, None
+    cache["a"]
+    cache["c"] = None, None, "x" * 500, None
+    assert "a" in cache
+    assert "b" not in cache
+
+
+def test_ttl():
+    cache = gh_cache.ResponseCache(1024)
+    cache.set("short", ("etag", None, 1, None), ttl=0)
+    cache["long"] = "etag", None, 2, None
+    with pytest.raises(KeyError):
+        cache["short"]
+    assert cache["long"][2] == 2
+    assert cache.stats()["expirations"] == 1
+
+
+class CountingCache(gh_cache.ResponseCache):
+
+    decoded = 0
+
+    def _decode(self, stored):
+        self.decoded += 1
+        return super()._decode(stored)
+
+
+@pytest.mark.asyncio
+async def test_revalidation():
+    cache = CountingCache(1024 * 1024)
+    url = "https://api.github.com/fake"
+    cache[url] = "12345", None, {"cached": True}, None
+    gh = MockGitHubAPI(304, cache=cache)
+    data = await gh.getitem(url)
+    assert data == {"cached": True}
+    assert gh.headers["if-none-match"] == "12345"
+    assert cache.decoded == 1
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["revalidations"] == 1
+
+
+@pytest.mark.asyncio
+async def test_changed_not_decoded():
+    cache = CountingCache(1024 * 1024)
+    url = "https://api.github.com/fake"
+    cache[url] = "12345", None, {"cached": True}, None
+    headers = MockGitHubAPI.DEFAULT_HEADERS.copy()
+    headers["etag"] = "67890"
+    gh = MockGitHubAPI(200, headers, body=b"42", cache=cache)
+    assert await gh.getitem(url) == 42
+    assert gh.headers["if-none-match"] == "12345"
+    assert cache.decoded == 0
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["revalidations"] == 0
+    # The response is stored as it came, not encoded again.
+    stored = cache.lookup(url)
+    assert stored.etag == "67890"
+    assert stored.body == b"42"
+    assert cache[url][2] == 42
@@ -0,0 +1,44 @@
+import pytest
+
+from gidgethub import codec
+
+from .test_sansio import sample
+
+
+@pytest.fixture(params=list(codec.CODECS))
+def json_codec(request):
+    try:
+        return codec.load(request.param)
+    except ImportError:
+        pytest.skip(f"{request.param} is not installed")
+
+
+def test_round_trip(json_codec):
+    data = {"title": "Fix ☃", "number": 42, "labels": [], "draft": False, "body": None}
+    encoded = json_codec.dumps(data)
+    assert isinstance(encoded, bytes)
+    assert json_codec.loads(encoded) == data
+
+
+def test_loads_bytes(json_codec):
+    _, body = sample("pr_single", 200)
+    assert json_codec.loads(body) == json_codec.loads(body.decode("utf-8"))
+
+
+def test_load_auto():
+    assert codec.load("auto").name in codec.CODECS
+
+
+def test_load_unknown():
+    with pytest.raises(ValueError):
+        codec.load("yaml")
+
+
+def test_use():
+    original = codec.get()
+    stdlib = codec.load("json")
+    try:
+        codec.use(stdlib)
+        assert codec.get() is stdlib
+    finally:
+        codec.use(original)
@@ -1,5 +1,8 @@
+import asyncio
+
 import pytest
 
+from gidgethub import DispatchError
 from gidgethub import routing
 from gidgethub import sansio
 
@@ -126,3 +129,108 @@ async def test_router_copy():
     await other_router.dispatch(event)
     assert deep_callback.called
     assert shallow_callback.called
+
+
+def test_event_types():
+    router = routing.Router()
+    assert router.event_types() == frozenset()
+    router.add(Callback().meth, "push")
+    router.add(Callback().meth, "pull_request", action="opened")
+    assert router.event_types() == {"push", "pull_request"}
+
+
+def test_actions():
+    router = routing.Router()
+    router.add(Callback().meth, "pull_request", action="opened")
+    router.add(Callback().meth, "pull_request", action="synchronize")
+    assert router.actions("pull_request") == {"opened", "synchronize"}
+    assert router.actions("push") == frozenset()
+    # Any action is of interest to shallow routes or other data keys.
+    router.add(Callback().meth, "issues", count=42)
+    assert router.actions("issues") is None
+    router.add(Callback().meth, "pull_request")
+    assert router.actions("pull_request") is None
+
+
+@pytest.mark.asyncio
+async def test_concurrent_dispatch():
+    router = routing.Router(concurrent=True)
+    order = []
+
+    async def slow(event):
+        await asyncio.sleep(0.05)
+        order.append("slow")
+
+    async def fast(event):
+        order.append("fast")
+
+    router.add(slow, "pull_request")
+    router.add(fast, "pull_request", action="opened")
+    event = sansio.Event({"action": "opened"}, event="pull_request",
+                         delivery_id="1234")
+    await router.dispatch(event)
+    assert order == ["fast", "slow"]
+
+
+@pytest.mark.asyncio
+async def test_concurrent_dispatch_errors():
+    router = routing.Router(concurrent=True, timeout=0.01)
+    callback = Callback()
+
+    async def fails(event):
+        raise ValueError("broken")
+
+    async def hangs(event):
+        await asyncio.sleep(1)
+
+    router.add(fails, "pull_request")
+    router.add(hangs, "pull_request")
+    router.add(callback.meth, "pull_request")
+    event = sansio.Event({}, event="pull_request", delivery_id="1234")
+    with pytest.raises(DispatchError) as exc_info:
+        await router.dispatch(event)
+    errors = exc_info.value.errors
+    assert len(errors) == 2
+    assert isinstance(errors[0], ValueError)
+    assert isinstance(errors[1], asyncio.TimeoutError)
+    # Failures do not stop the other callbacks.
+    assert callback.called
+
+
+@pytest.mark.asyncio
+async def test_sequential_timeout():
+    router = routing.Router(timeout=0.01)
+
+    async def hangs(event):
+        await asyncio.sleep(1)
+
+    router.add(hangs, "pull_request")
+    event = sansio.Event({}, event="pull_request", delivery_id="1234")
+    with pytest.raises(asyncio.TimeoutError):
+        await router.dispatch(event)
+
+
+@pytest.mark.asyncio
+async def test_callback_stats():
+    router = routing.Router()
+    callback = Callback()
+    router.add(callback.meth, "pull_request")
+    event = sansio.Event({}, event="pull_request", delivery_id="1234")
+    await router.dispatch(event)
+    await router.dispatch(event)
+    stats = router.callback_stats()["Callback.meth"]
+    assert stats["calls"] == 2
+    assert stats["errors"] == 0
+    assert stats["max"] >= stats["mean"] >= 0
+
+
+@pytest.mark.asyncio
+async def test_dispatch_after_add():
+    router = routing.Router()
+    event = sansio.Event({"action": "new"}, event="pull_request",
+                         delivery_id="1234")
+    await router.dispatch(event)
+    callback = Callback()
+    router.add(callback.meth, "pull_request", action="new")
+    await router.dispatch(event)
+    assert callback.called
@@ -37,6 +37,33 @@ class TestValidateEvent:
                                   signature=self.signature)
 
 
+class TestEventValidator:
+
+    """Tests for gidgethub.sansio.EventValidator."""
+
+    secret = TestValidateEvent.secret
+    signature = TestValidateEvent.signature
+
+    def test_malformed_signature(self):
+        with pytest.raises(ValidationFailure):
+            sansio.EventValidator(secret=self.secret,
+                                  signature=TestValidateEvent.hash_signature)
+
+    def test_chunks(self):
+        validator = sansio.EventValidator(secret=self.secret,
+                                          signature=self.signature)
+        for chunk in (b"gid", b"", b"get"):
+            validator.update(chunk)
+        validator.verify()
+
+    def test_failure(self):
+        validator = sansio.EventValidator(secret=self.secret,
+                                          signature=self.signature)
+        validator.update(b"gidget!")
+        with pytest.raises(ValidationFailure):
+            validator.verify()
+
+
 class TestEvent:
 
     """Tests for gidgethub.sansio.Event."""
@@ -66,6 +93,27 @@ class TestEvent:
                                        secret=self.secret)
         self.check_event(event)
 
+    def test_from_http_validator(self):
+        """Construct an event from a body validated while it was read."""
+        validator = sansio.EventValidator(
+            signature=self.headers["x-hub-signature"], secret=self.secret)
+        body = bytearray()
+        for index in range(0, len(self.data_bytes), 4):
+            chunk = self.data_bytes[index:index + 4]
+            validator.update(chunk)
+            body += chunk
+        event = sansio.Event.from_http(self.headers, body, secret=self.secret,
+                                       validator=validator)
+        self.check_event(event)
+
+    def test_from_http_validator_bad_signature(self):
+        validator = sansio.EventValidator(
+            signature=self.headers["x-hub-signature"], secret=self.secret)
+        validator.update(self.data_bytes + b" ")
+        with pytest.raises(ValidationFailure):
+            sansio.Event.from_http(self.headers, self.data_bytes,
+                                   secret=self.secret, validator=validator)
+
     def test_from_http_urlencoded(self):
         headers, body = sample("ping_urlencoded", 200)
         event = sansio.Event.from_http(headers, body)
@@ -0,0 +1,39 @@
+import collections
+
+
+class Timing:
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def stats(self):
+        mean = self.total / self.count if self.count else 0.0
+        return {'count': self.count, 'mean': mean, 'max': self.max}
+
+
+class Metrics:
+    def __init__(self):
+        self.counters = collections.Counter()
+        self._collectors = {}
+
+    def incr(self, name, value=1):
+        self.counters[name] += value
+
+    def register(self, name, collector):
+        """Report the result of calling collector under name in snapshots."""
+        self._collectors[name] = collector
+
+    def snapshot(self):
+        snapshot = dict(self.counters)
+        for name, collector in self._collectors.items():
+            snapshot[name] = collector()
+        return snapshot
+
+
+metrics = Metrics()
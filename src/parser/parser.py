@@ -1,32 +1,15 @@
+import cachetools
+import hashlib
+import time
 import yaml
 
-from rules import rule
+from config import config
+from rules import redos, rule, rule_set
 
 check = ' Check [the docs](https://github.com/Nextdoor/barrelman) for help.'
 
-"""
-Diffs have 4 kinds of lines
-context lines, which start with a single space,
-insertion lines that show a line that has been inserted, which start with a +,
-deletion lines, which start with a -, and
-metadata lines which describe higher level things like which file this is talking about, what options were used to generate the diff, 
-    whether the file changed its permissions, etc.
-"""
-
-
-# Remove context lines to reduce false positives
-# Only look at insertion lines or metadata lines
-def parse_diff(diff):
-    lines = diff.splitlines(True)
-    for i in range(len(lines) - 1, -1, -1):
-        first_char = str(lines[i])[0]
-        if first_char == ' ' or first_char == '-':
-            del lines[i]
-        # Remove the plus
-        elif first_char == '+':
-            lines[i] = str(lines[i])[1:]
-    parsed_diff = ''.join(lines)
-    return parsed_diff
+# Keys a rule written as a mapping may have.
+_RULE_KEYS = {'watchers', 'paths', 'exclude'}
 
 
 def parse_barrel_rules(yml):
@@ -50,9 +33,68 @@ def parse_barrel_rules(yml):
     # yaml can generate a valid python object with no exceptions but format is incorrect
     try:
         for pattern, watchers in patterns.items():
-            pattern_rules.append(rule.BarrelmanPatternRule(pattern, watchers))
+            if isinstance(watchers, dict):
+                if not set(watchers) <= _RULE_KEYS:
+                    raise ValueError('unknown keys in rule')
+                pattern_rules.append(rule.BarrelmanPatternRule(
+                    pattern, watchers['watchers'], paths=watchers.get('paths'),
+                    exclude=watchers.get('exclude')))
+            else:
+                pattern_rules.append(rule.BarrelmanPatternRule(pattern, watchers))
     except:
         error_msg = 'Parsing barrelman.yml worked but the format is incorrect.\n'
         error_msg += '\n' + check
         return error_msg
+
+    # Reject patterns that could stall matching for every repo
+    fuzz_deadline = time.perf_counter() + redos.FUZZ_FILE_BUDGET
+    for pattern_rule in pattern_rules:
+        problems = redos.check(pattern_rule.regex, fuzz=config.redos_fuzz, deadline=fuzz_deadline)
+        if problems:
+            error_msg += (f'Pattern \'{pattern_rule.pattern}\' can make matching very slow: ' +
+                          ', '.join(problems) + '.\n')
+    if error_msg:
+        return error_msg + 'Please rewrite these patterns in barrelman.yml.' + check
     return pattern_rules
+
+
+class RuleCache:
+    """LRU of parsed and compiled rule sets keyed by the sha1 of barrelman.yml.
+
+    parse() returns the same values as parse_barrel_rules(), except that
+    valid rules come back as a ready to use RuleSet.
+    """
+
+    def __init__(self, maxsize=128):
+        self._cache = cachetools.LRUCache(maxsize=maxsize)
+        self.hits = 0
+        self.misses = 0
+
+    def parse(self, yml):
+        if isinstance(yml, str):
+            key = hashlib.sha1(yml.encode()).hexdigest()
+        elif isinstance(yml, bytes):
+            key = hashlib.sha1(yml).hexdigest()
+        else:
+            return _compile_rules(yml)
+
+        try:
+            parsed = self._cache[key]
+        except KeyError:
+            self.misses += 1
+        else:
+            self.hits += 1
+            return parsed
+
+        parsed = self._cache[key] = _compile_rules(yml)
+        return parsed
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._cache)}
+
+
+def _compile_rules(yml):
+    parsed = parse_barrel_rules(yml)
+    if type(parsed) is str:
+        return parsed
+    return rule_set.RuleSet(parsed)
@@ -0,0 +1,58 @@
+import functools
+
+from rules import globs
+
+# Lockfiles, minified assets and vendored trees are regenerated or copied
+# wholesale; nobody reviews them line by line.
+DEFAULT_SKIP_PATHS = [
+    '*.lock',
+    'package-lock.json',
+    'pnpm-lock.yaml',
+    'go.sum',
+    '*.min.js',
+    '*.min.css',
+    '*.map',
+    'vendor/',
+    'node_modules/',
+    'third_party/',
+]
+
+DEFAULT_MAX_FILE_BYTES = 1024 * 1024
+
+
+@functools.lru_cache(maxsize=8)
+def _glob_set(paths):
+    return globs.GlobSet(paths)
+
+
+class SkipPolicy:
+    def __init__(self, paths=None, max_file_bytes=DEFAULT_MAX_FILE_BYTES):
+        if paths is None:
+            paths = DEFAULT_SKIP_PATHS
+        self.paths = tuple(paths)
+        self.max_file_bytes = max_file_bytes
+        self._glob_set = _glob_set(self.paths) if self.paths else None
+
+    def reason(self, diff_file):
+        """Return why diff_file should not be matched, or None to keep it."""
+        if diff_file.binary:
+            return 'binary file'
+        if self._glob_set is not None:
+            matched = self._glob_set.matching(diff_file.path)
+            if matched:
+                return f'matches `{self.paths[min(matched)]}`'
+        if self.max_file_bytes and diff_file.added_bytes > self.max_file_bytes:
+            return f'{diff_file.added_bytes} added bytes, over the {self.max_file_bytes} limit'
+        return None
+
+    def apply(self, diff):
+        """Drop skipped files from diff and return (path, reason) for each."""
+        kept, skipped = [], []
+        for diff_file in diff.files:
+            reason = self.reason(diff_file)
+            if reason is None:
+                kept.append(diff_file)
+            else:
+                skipped.append((diff_file.path, reason))
+        diff.files = kept
+        return skipped
@@ -0,0 +1,115 @@
+"""
+A unified diff split per file. The added lines of every file are stored
+once, without their leading plus, in a shared buffer; files and hunks only
+hold offsets into it. Metadata, context and deleted lines are not kept.
+"""
+import re
+
+_hunk_header = re.compile(r'@@ -\d+(?:,\d+)? \+(\d+)')
+# Lines of a hunk body; some tools write empty context lines without a space.
+_hunk_body = re.compile(r'(?:[-+ \\][^\n]*\n?|\n)*')
+_added_line = re.compile(r'^\+([^\n]*\n?)', re.MULTILINE)
+
+
+class Hunk:
+    __slots__ = ('new_start', 'start', 'end')
+
+    def __init__(self, new_start, start):
+        # First line number of the hunk in the new version of the file.
+        self.new_start = new_start
+        self.start = start
+        self.end = start
+
+
+class DiffFile:
+    __slots__ = ('path', 'old_path', 'status', 'binary', 'start', 'end', 'hunks')
+
+    def __init__(self, path, start):
+        self.path = path
+        self.old_path = path
+        self.status = 'modified'
+        self.binary = False
+        self.start = start
+        self.end = start
+        self.hunks = []
+
+    @property
+    def added_bytes(self):
+        return self.end - self.start
+
+
+class Diff:
+    __slots__ = ('buffer', 'files')
+
+    def __init__(self, buffer, files):
+        self.buffer = buffer
+        self.files = files
+
+    def paths(self):
+        return [diff_file.path for diff_file in self.files]
+
+    def text(self, diff_file):
+        return self.buffer[diff_file.start:diff_file.end]
+
+
+def _strip_prefix(path):
+    path = path.rstrip('\t\n')
+    if path.startswith('"') and path.endswith('"'):
+        path = path[1:-1]
+    if path.startswith(('a/', 'b/')):
+        return path[2:]
+    return path
+
+
+def parse(text):
+    added = []
+    length = 0
+    files = []
+    diff_file = None
+
+    pos = 0
+    size = len(text)
+    while pos < size:
+        end = text.find('\n', pos)
+        end = size if end == -1 else end + 1
+
+        if text.startswith('diff --git ', pos):
+            header = text[pos + len('diff --git '):end]
+            path = _strip_prefix(header.rsplit(' b/', 1)[-1])
+            diff_file = DiffFile(path, length)
+            files.append(diff_file)
+        elif diff_file is None:
+            pass
+        elif text.startswith('@@', pos):
+            found = _hunk_header.match(text, pos)
+            hunk = Hunk(int(found.group(1)) if found else 0, length)
+            diff_file.hunks.append(hunk)
+            # Collect the whole body at C speed instead of line by line.
+            body_end = _hunk_body.match(text, end).end()
+            lines = _added_line.findall(text, end, body_end)
+            added.extend(lines)
+            length += sum(map(len, lines))
+            hunk.end = diff_file.end = length
+            end = body_end
+        elif text.startswith('+++ ', pos):
+            path = text[pos + 4:end]
+            if not path.startswith('/dev/null'):
+                diff_file.path = _strip_prefix(path)
+        elif text.startswith('--- ', pos):
+            path = text[pos + 4:end]
+            if not path.startswith('/dev/null'):
+                diff_file.old_path = _strip_prefix(path)
+        elif text.startswith('new file mode', pos):
+            diff_file.status = 'added'
+        elif text.startswith('deleted file mode', pos):
+            diff_file.status = 'removed'
+        elif text.startswith('rename from ', pos):
+            diff_file.status = 'renamed'
+            diff_file.old_path = text[pos + len('rename from '):end].rstrip('\n')
+        elif text.startswith('rename to ', pos):
+            diff_file.path = text[pos + len('rename to '):end].rstrip('\n')
+        elif text.startswith(('Binary files ', 'GIT binary patch'), pos):
+            diff_file.binary = True
+        pos = end
+
+    return Diff(''.join(added), files)
@@ -0,0 +1,47 @@
+import io
+
+from parser import parser
+from rules import rule_set
+
+_YML = 'import requests: [someone]\n'
+
+
+def test_rule_cache_hits_and_misses():
+    rule_cache = parser.RuleCache()
+    first = rule_cache.parse(_YML)
+    assert isinstance(first, rule_set.RuleSet)
+    assert [rule.pattern for rule in first.rules] == ['import requests']
+    assert rule_cache.parse(_YML) is first
+    assert rule_cache.stats() == {'hits': 1, 'misses': 1, 'size': 1}
+
+
+def test_rule_cache_str_and_bytes():
+    rule_cache = parser.RuleCache()
+    # GitHub may hand the file over either way; both are the same file.
+    parsed = rule_cache.parse(_YML.encode())
+    assert rule_cache.parse(_YML) is parsed
+    assert rule_cache.stats()['size'] == 1
+
+
+def test_rule_cache_errors():
+    rule_cache = parser.RuleCache()
+    error = rule_cache.parse('import requests: [someone')
+    assert type(error) is str
+    assert rule_cache.parse('import requests: [someone') is error
+    assert rule_cache.stats() == {'hits': 1, 'misses': 1, 'size': 1}
+
+
+def test_rule_cache_maxsize():
+    rule_cache = parser.RuleCache(maxsize=2)
+    for index in range(3):
+        rule_cache.parse(f'import requests{index}: [someone]\n')
+    assert rule_cache.stats()['size'] == 2
+    rule_cache.parse('import requests0: [someone]\n')
+    assert rule_cache.stats()['misses'] == 4
+
+
+def test_rule_cache_streams_not_cached():
+    rule_cache = parser.RuleCache()
+    parsed = rule_cache.parse(io.StringIO(_YML))
+    assert [rule.pattern for rule in parsed.rules] == ['import requests']
+    assert rule_cache.stats() == {'hits': 0, 'misses': 0, 'size': 0}
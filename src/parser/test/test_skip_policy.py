@@ -0,0 +1,43 @@
+from parser import skip_policy, structured_diff
+
+
+def _diff(*files):
+    text = ''
+    for path, lines in files:
+        text += f'diff --git a/{path} b/{path}\n--- a/{path}\n+++ b/{path}\n@@ -1 +1,{len(lines)} @@\n'
+        text += ''.join(f'+{line}\n' for line in lines)
+    return structured_diff.parse(text)
+
+
+def test_default_paths():
+    policy = skip_policy.SkipPolicy()
+    diff = _diff(('src/app.py', ['x']), ('yarn.lock', ['x']), ('web/vendor/lib.js', ['x']),
+                 ('static/app.min.js', ['x']), ('web/node_modules/a/index.js', ['x']))
+    skipped = policy.apply(diff)
+    assert diff.paths() == ['src/app.py']
+    assert skipped == [
+        ('yarn.lock', 'matches `*.lock`'),
+        ('web/vendor/lib.js', 'matches `vendor/`'),
+        ('static/app.min.js', 'matches `*.min.js`'),
+        ('web/node_modules/a/index.js', 'matches `node_modules/`'),
+    ]
+
+
+def test_binary():
+    diff = structured_diff.parse(
+        'diff --git a/logo.png b/logo.png\nBinary files a/logo.png and b/logo.png differ\n')
+    assert skip_policy.SkipPolicy(paths=[]).apply(diff) == [('logo.png', 'binary file')]
+    assert diff.files == []
+
+
+def test_max_file_bytes():
+    policy = skip_policy.SkipPolicy(paths=[], max_file_bytes=10)
+    diff = _diff(('small.py', ['x = 1']), ('big.py', ['x = 1', 'y = 2']))
+    assert policy.apply(diff) == [('big.py', '12 added bytes, over the 10 limit')]
+    assert diff.paths() == ['small.py']
+
+
+def test_no_limit():
+    policy = skip_policy.SkipPolicy(paths=[], max_file_bytes=0)
+    diff = _diff(('big.py', ['x' * 100]))
+    assert policy.apply(diff) == []
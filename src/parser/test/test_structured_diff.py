@@ -0,0 +1,111 @@
+from parser import structured_diff
+
+_DIFF = '''\
+diff --git a/src/app.py b/src/app.py
+index 83db48f..bf269f4 100644
+--- a/src/app.py
++++ b/src/app.py
+@@ -1,3 +1,4 @@
+ import os
+-import sys
++import requests
++import json
+
+@@ -10 +11,2 @@ def main():
++    requests.get(url)
+\\ No newline at end of file
+diff --git a/old name.py b/new name.py
+similarity index 90%
+rename from old name.py
+rename to new name.py
+index 1111111..2222222 100644
+--- a/old name.py
++++ b/new name.py
+@@ -1 +1 @@
+-x = 1
++x = 2
+diff --git a/logo.png b/logo.png
+index 3333333..4444444 100644
+Binary files a/logo.png and b/logo.png differ
+diff --git a/gone.py b/gone.py
+deleted file mode 100644
+index 5555555..0000000
+--- a/gone.py
++++ /dev/null
+@@ -1,2 +0,0 @@
+-import os
+-print(os.name)
+diff --git a/new.py b/new.py
+new file mode 100644
+index 0000000..6666666
+--- /dev/null
++++ b/new.py
+@@ -0,0 +1 @@
++print('hi')
+\\ No newline at end of file
+'''
+
+
+def _files():
+    diff = structured_diff.parse(_DIFF)
+    return diff, {diff_file.path: diff_file for diff_file in diff.files}
+
+
+def test_paths():
+    diff, _ = _files()
+    assert diff.paths() == ['src/app.py', 'new name.py', 'logo.png', 'gone.py', 'new.py']
+
+
+def test_added_lines():
+    diff, files = _files()
+    assert diff.text(files['src/app.py']) == 'import requests\nimport json\n    requests.get(url)\n'
+    # The marker for a missing newline is not part of the added text.
+    assert diff.text(files['new.py']) == "print('hi')\n"
+    assert diff.buffer == ('import requests\nimport json\n    requests.get(url)\n' +
+                           'x = 2\n' + "print('hi')\n")
+
+
+def test_hunks():
+    diff, files = _files()
+    hunks = files['src/app.py'].hunks
+    assert [hunk.new_start for hunk in hunks] == [1, 11]
+    assert [diff.buffer[hunk.start:hunk.end] for hunk in hunks] == [
+        'import requests\nimport json\n', '    requests.get(url)\n']
+
+
+def test_rename():
+    diff, files = _files()
+    renamed = files['new name.py']
+    assert renamed.status == 'renamed'
+    assert renamed.old_path == 'old name.py'
+    assert diff.text(renamed) == 'x = 2\n'
+
+
+def test_binary():
+    diff, files = _files()
+    binary = files['logo.png']
+    assert binary.binary
+    assert binary.hunks == []
+    assert binary.added_bytes == 0
+
+
+def test_deletion():
+    _, files = _files()
+    removed = files['gone.py']
+    assert removed.status == 'removed'
+    assert removed.old_path == 'gone.py'
+    assert removed.added_bytes == 0
+
+
+def test_new_file():
+    _, files = _files()
+    added = files['new.py']
+    assert added.status == 'added'
+    assert added.old_path == 'new.py'
+    assert not added.binary
+
+
+def test_empty():
+    diff = structured_diff.parse('')
+    assert diff.files == []
+    assert diff.buffer == ''
@@ -0,0 +1,69 @@
+import re
+
+
+def translate(glob):
+    """Translate a gitignore style glob into a regex for repo relative paths.
+
+    '*' and '?' stay within one path segment, '**' spans segments and a glob
+    without a slash matches a file or directory name at any depth. Anything
+    under a matching directory matches as well.
+    """
+    if glob.startswith('/'):
+        glob = glob[1:]
+        anchored = True
+    else:
+        anchored = '/' in glob.rstrip('/')
+    glob = glob.rstrip('/')
+
+    parts = []
+    i, size = 0, len(glob)
+    while i < size:
+        char = glob[i]
+        if glob.startswith('**/', i):
+            parts.append('(?:.*/)?')
+            i += 3
+            continue
+        if glob.startswith('**', i):
+            parts.append('.*')
+            i += 2
+            continue
+        if char == '*':
+            parts.append('[^/]*')
+        elif char == '?':
+            parts.append('[^/]')
+        elif char == '[':
+            close = glob.find(']', i + 2)
+            if close == -1:
+                parts.append(re.escape(char))
+            else:
+                members = glob[i + 1:close].replace('\\', '\\\\')
+                if members.startswith('!'):
+                    members = '^' + members[1:]
+                parts.append(f'[{members}]')
+                i = close
+        else:
+            parts.append(re.escape(char))
+        i += 1
+
+    prefix = '' if anchored else '(?:.*/)?'
+    return prefix + ''.join(parts) + '(?:/.*)?'
+
+
+class GlobSet:
+    """Match a path against many globs with a single regex call.
+
+    Every glob becomes an optional lookahead with its own named group, all
+    anchored at the start of the path, so one match() reports every glob the
+    path satisfies.
+    """
+
+    def __init__(self, globs):
+        self.globs = list(globs)
+        lookaheads = ''.join(
+            f'(?:(?=(?P<g{index}>{translate(glob)})\\Z))?' for index, glob in enumerate(self.globs))
+        self._regex = re.compile(lookaheads, re.DOTALL)
+
+    def matching(self, path):
+        """Return the set of indexes of the globs that match path."""
+        found = self._regex.match(path)
+        return {int(name[1:]) for name, value in found.groupdict().items() if value is not None}
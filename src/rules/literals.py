@@ -0,0 +1,74 @@
+import re
+import sre_constants
+import sre_parse
+
+_REPEATS = (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT)
+
+
+def required_literal(regex):
+    """Return the longest literal every match of regex must contain, or None."""
+    if regex.flags & re.IGNORECASE:
+        return None
+    try:
+        parsed = sre_parse.parse(regex.pattern, regex.flags)
+    except (re.error, OverflowError, RecursionError):
+        return None
+    runs = list(_literal_runs(parsed))
+    if not runs:
+        return None
+    return max(runs, key=len)
+
+
+def _literal_runs(items):
+    """Yield runs of literal text that any match of items contains."""
+    run = []
+    for op, av in items:
+        if op is sre_constants.LITERAL:
+            run.append(chr(av))
+            continue
+        if op is sre_constants.AT:
+            # Anchors are zero width and do not split the surrounding text.
+            continue
+        if run:
+            yield ''.join(run)
+            run = []
+        if op is sre_constants.SUBPATTERN:
+            _, add_flags, _, sub = av
+            if not add_flags & sre_constants.SRE_FLAG_IGNORECASE:
+                yield from _literal_runs(sub)
+        elif op in _REPEATS:
+            minimum, _, sub = av
+            if minimum >= 1:
+                yield from _literal_runs(sub)
+    if run:
+        yield ''.join(run)
+
+
+class LiteralIndex:
+    """Find which of a set of literals occur in a text.
+
+    Every literal is looked up with str.find, which skips through the text
+    far faster than any regex can. A literal that is found implies all the
+    literals it contains, so those are not searched for again.
+    """
+
+    def __init__(self, literals):
+        self.literals = sorted(set(literals), key=lambda literal: (-len(literal), literal))
+        self._contained = {
+            literal: [other for other in self.literals
+                      if other != literal and other in literal]
+            for literal in self.literals
+        }
+
+    def present(self, text, pos=0, endpos=None):
+        """Return the set of literals that occur in text[pos:endpos]."""
+        found = set()
+        if endpos is None:
+            endpos = len(text)
+        for literal in self.literals:
+            if literal in found:
+                continue
+            if text.find(literal, pos, endpos) != -1:
+                found.add(literal)
+                found.update(self._contained[literal])
+        return found
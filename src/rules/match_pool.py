@@ -0,0 +1,185 @@
+"""
+Rule matching in worker processes, so a slow pattern on a large diff cannot
+stall the event loop. Every worker is a long lived process that keeps its
+own cache of compiled rule sets. A task that runs past its budget gets its
+worker killed and replaced, and the rules that had not fired by then are
+reported as timed out.
+"""
+import asyncio
+import concurrent.futures
+import multiprocessing
+import os
+import signal
+import time
+
+from rules import rule_checker
+
+
+def _worker_main(conn):
+    # Imported here so the parent does not need the parser to start workers.
+    from parser import parser
+
+    rule_cache = parser.RuleCache()
+    while True:
+        task = conn.recv()
+        if task is None:
+            return
+        yml, buffer, files, max_locations = task
+        rules = rule_cache.parse(yml)
+        if type(rules) is str:
+            conn.send(('error', rules))
+            continue
+        checker = rule_checker.RuleChecker(rules, max_locations=max_locations)
+        index_of = {rule: index for index, rule in enumerate(rules.rules)}
+        for path, start, end in files:
+            triggered = checker.check_text(buffer, start, end, path)
+            if triggered:
+                conn.send(('progress', path, [index_of[rule] for rule in triggered]))
+        locations = {index_of[rule]: spans for rule, spans in checker.match_locations.items()}
+        conn.send(('done', locations))
+
+
+class _Worker:
+    def __init__(self, context):
+        self._context = context
+        self.process = None
+        self.conn = None
+        self.start()
+
+    def start(self):
+        self.conn, child_conn = self._context.Pipe()
+        self.process = self._context.Process(target=_worker_main, args=(child_conn,), daemon=True)
+        self.process.start()
+        child_conn.close()
+
+    def kill(self):
+        self.conn.close()
+        self.process.terminate()
+        self.process.join(1)
+        if self.process.is_alive():
+            os.kill(self.process.pid, signal.SIGKILL)
+            self.process.join()
+
+    def restart(self):
+        self.kill()
+        self.start()
+
+    def run(self, task, deadline):
+        """Send task and collect messages until it is done or deadline passes.
+
+        Runs in a thread. Returns the progress messages received and the
+        final message, which is None when the deadline passed.
+        """
+        # A restart from the event loop replaces self.conn while an abandoned
+        # run may still be polling, so stick to the connection it started on.
+        conn = self.conn
+        conn.send(task)
+        progress = []
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not conn.poll(remaining):
+                return progress, None
+            message = conn.recv()
+            if message[0] == 'progress':
+                progress.append(message)
+            else:
+                return progress, message
+
+
+class MatchPool:
+    def __init__(self):
+        self.workers = 0
+        self.timeout = None
+        self._idle = None
+        self._executor = None
+        self.tasks = 0
+        self.timeouts = 0
+        self.errors = 0
+
+    def start(self, workers, timeout):
+        """Start worker processes; with none, matching runs on the event loop."""
+        self.workers = workers
+        self.timeout = timeout
+        if not workers:
+            return
+        context = multiprocessing.get_context('spawn')
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+        self._idle = asyncio.Queue()
+        for _ in range(workers):
+            self._idle.put_nowait(_Worker(context))
+
+    def close(self):
+        if not self.workers:
+            return
+        while not self._idle.empty():
+            worker = self._idle.get_nowait()
+            try:
+                worker.conn.send(None)
+            except OSError:
+                pass
+            worker.kill()
+        self._executor.shutdown(wait=False)
+        self.workers = 0
+
+    def _restart(self, worker):
+        # Killing can wait on the process for a second and spawning imports
+        # the parser, so both happen in the executor. The worker goes back
+        # to the idle queue once that is over, even if the caller was
+        # cancelled in the meantime.
+        loop = asyncio.get_event_loop()
+        future = loop.run_in_executor(self._executor, worker.restart)
+        future.add_done_callback(lambda _: self._idle.put_nowait(worker))
+
+    async def check(self, yml, rules, diff, max_locations=0):
+        """Match the structured diff against rules, parsed from yml.
+
+        Returns a RuleChecker with the results, as if check_rules() had run.
+        """
+        checker = rule_checker.RuleChecker(rules, max_locations=max_locations)
+        if not self.workers:
+            checker.check_rules(diff)
+            return checker
+
+        files = [(f.path, f.start, f.end) for f in diff.files if f.start < f.end]
+        task = (yml, diff.buffer, files, max_locations)
+        self.tasks += 1
+
+        worker = await self._idle.get()
+        deadline = time.monotonic() + self.timeout
+        progress, result = [], None
+        try:
+            loop = asyncio.get_event_loop()
+            progress, result = await loop.run_in_executor(self._executor, worker.run, task, deadline)
+        except (OSError, EOFError):
+            result = ('error', 'worker exited')
+        finally:
+            # A worker that timed out or was abandoned may still be matching.
+            if result is None or result[0] == 'error':
+                self._restart(worker)
+            else:
+                self._idle.put_nowait(worker)
+
+        for _, path, indexes in progress:
+            for index in indexes:
+                checker.record(checker.rules[index], path)
+        if result is None:
+            self.timeouts += 1
+            checker.timed_out_rules = [rule for rule in checker.rules
+                                       if (rule.users or rule.teams)
+                                       and rule not in checker.match_locations]
+        elif result[0] == 'error':
+            self.errors += 1
+            raise RuntimeError(f'rule matching failed: {result[1]}')
+        else:
+            for index, spans in result[1].items():
+                checker.match_locations[checker.rules[index]].extend(spans)
+        return checker
+
+    def stats(self):
+        return {
+            'workers': self.workers,
+            'idle': self._idle.qsize() if self._idle is not None else 0,
+            'tasks': self.tasks,
+            'timeouts': self.timeouts,
+            'errors': self.errors,
+        }
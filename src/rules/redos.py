@@ -0,0 +1,251 @@
+"""
+Static checks for patterns that make Python's backtracking regex engine take
+exponential or high polynomial time. The checks work on the parsed pattern
+and approximate character classes by testing them against a sample
+alphabet, which is enough to tell whether two pieces can match the same
+text.
+"""
+import re
+import sre_constants
+import sre_parse
+import time
+
+_REPEATS = (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT)
+_ZERO_WIDTH = (sre_constants.AT, sre_constants.ASSERT, sre_constants.ASSERT_NOT)
+_MAXREPEAT = sre_constants.MAXREPEAT
+
+_ALPHABET = frozenset(chr(code) for code in range(128)) | frozenset('é٣ \xa0')
+
+_CATEGORIES = {
+    sre_constants.CATEGORY_DIGIT: lambda char: char.isdecimal(),
+    sre_constants.CATEGORY_NOT_DIGIT: lambda char: not char.isdecimal(),
+    sre_constants.CATEGORY_SPACE: lambda char: char.isspace(),
+    sre_constants.CATEGORY_NOT_SPACE: lambda char: not char.isspace(),
+    sre_constants.CATEGORY_WORD: lambda char: char.isalnum() or char == '_',
+    sre_constants.CATEGORY_NOT_WORD: lambda char: not (char.isalnum() or char == '_'),
+}
+
+NESTED_QUANTIFIERS = 'nested quantifiers'
+OVERLAPPING_ALTERNATION = 'overlapping alternatives inside a repeat'
+AMBIGUOUS_REPEATS = 'adjacent repeats that can match the same text'
+SLOW_MATCH = 'slow matching on crafted input'
+
+# Fuzzing stops as soon as one input takes longer than this many seconds.
+# Inputs stay short enough that quadratic patterns like '\s*\w+' pass.
+FUZZ_BUDGET = 0.05
+_FUZZ_MAX_LENGTH = 1024
+# Total seconds spent fuzzing one pattern before giving it the benefit of the doubt.
+_FUZZ_TOTAL = 0.5
+# Seconds of fuzzing allowed for a whole barrelman.yml, as it runs on the
+# event loop; patterns checked after it ran out only get the static checks.
+FUZZ_FILE_BUDGET = 0.5
+
+
+def _in_set(items):
+    negate = False
+    chars = set()
+    for op, av in items:
+        if op is sre_constants.NEGATE:
+            negate = True
+        elif op is sre_constants.LITERAL:
+            chars.add(chr(av))
+        elif op is sre_constants.RANGE:
+            low, high = av
+            chars.update(char for char in _ALPHABET if low <= ord(char) <= high)
+        elif op is sre_constants.CATEGORY:
+            test = _CATEGORIES.get(av)
+            chars.update(_ALPHABET if test is None else filter(test, _ALPHABET))
+    return _ALPHABET - chars if negate else frozenset(chars)
+
+
+def _first(items):
+    """Return the characters a match of items can start with, and whether
+    items can match the empty string.
+    """
+    first = set()
+    for op, av in items:
+        node_first, nullable = _first_node(op, av)
+        first |= node_first
+        if not nullable:
+            return frozenset(first), False
+    return frozenset(first), True
+
+
+def _last(items):
+    """Return the characters a match of items can end with, and whether
+    items can match the empty string.
+    """
+    last = set()
+    for op, av in reversed(items):
+        node_last, nullable = _first_node(op, av, _last)
+        last |= node_last
+        if not nullable:
+            return frozenset(last), False
+    return frozenset(last), True
+
+
+def _first_node(op, av, first=_first):
+    """Return the characters a match of the node starts with, or ends with
+    when first is _last, and whether it can match the empty string.
+    """
+    if op is sre_constants.LITERAL:
+        return frozenset(chr(av)), False
+    if op is sre_constants.NOT_LITERAL:
+        return _ALPHABET - {chr(av)}, False
+    if op is sre_constants.ANY:
+        return _ALPHABET - {'\n'}, False
+    if op is sre_constants.IN:
+        return _in_set(av), False
+    if op is sre_constants.SUBPATTERN:
+        return first(av[-1])
+    if op is sre_constants.BRANCH:
+        chars, nullable = set(), False
+        for branch in av[1]:
+            branch_chars, branch_nullable = first(branch)
+            chars |= branch_chars
+            nullable = nullable or branch_nullable
+        return frozenset(chars), nullable
+    if op in _REPEATS:
+        minimum, _, sub = av
+        chars, nullable = first(sub)
+        return chars, nullable or minimum == 0
+    if op in _ZERO_WIDTH:
+        return frozenset(), True
+    # Group references and anything newer: assume the worst.
+    return _ALPHABET, True
+
+
+def _tail_repeats(items, rest_nullable):
+    """Yield the bodies of unbounded repeats that can end a match of items.
+
+    Those are the repeats only followed by text that may be empty.
+    """
+    for index, (op, av) in enumerate(items):
+        after_nullable = rest_nullable and _first(items[index + 1:])[1]
+        if op in _REPEATS:
+            if av[1] == _MAXREPEAT and after_nullable:
+                yield av[2]
+        elif op is sre_constants.SUBPATTERN:
+            yield from _tail_repeats(av[-1], after_nullable)
+        elif op is sre_constants.BRANCH:
+            for branch in av[1]:
+                yield from _tail_repeats(branch, after_nullable)
+
+
+def _branches(items):
+    for op, av in items:
+        if op is sre_constants.BRANCH:
+            yield av[1]
+            for branch in av[1]:
+                yield from _branches(branch)
+        elif op is sre_constants.SUBPATTERN:
+            yield from _branches(av[-1])
+
+
+def _branches_overlap(branches):
+    seen = set()
+    nullable_seen = False
+    for branch in branches:
+        first, nullable = _first(branch)
+        if seen & first or (nullable and nullable_seen):
+            return True
+        seen |= first
+        nullable_seen = nullable_seen or nullable
+    return False
+
+
+def _walk(items, problems):
+    """Add the problems found in items and everything nested in them."""
+    # Characters the unbounded repeats since the last required text can end
+    # with; a repeat starting with one of them can take over its text.
+    previous = frozenset()
+    for op, av in items:
+        node_nullable = _first_node(op, av)[1]
+        if not node_nullable:
+            previous_before, previous = previous, frozenset()
+        else:
+            previous_before = previous
+
+        if op in _REPEATS:
+            _, maximum, sub = av
+            first, _ = _first(sub)
+            if maximum == _MAXREPEAT and first:
+                if any(_first(inner)[0] & first for inner in _tail_repeats(sub, True)):
+                    problems.add(NESTED_QUANTIFIERS)
+                if any(_branches_overlap(branches) for branches in _branches(sub)):
+                    problems.add(OVERLAPPING_ALTERNATION)
+                if previous_before & first:
+                    problems.add(AMBIGUOUS_REPEATS)
+                previous = previous | _last(sub)[0]
+            _walk(sub, problems)
+        elif op is sre_constants.SUBPATTERN:
+            _walk(av[-1], problems)
+        elif op is sre_constants.BRANCH:
+            for branch in av[1]:
+                _walk(branch, problems)
+        elif op in (sre_constants.ASSERT, sre_constants.ASSERT_NOT):
+            _walk(av[1], problems)
+
+
+def _fuzz_inputs(items):
+    """Yield functions that build inputs of a given length.
+
+    Inputs pump the characters repeats consume and end in text that is
+    unlikely to let the whole pattern match.
+    """
+    chars = set()
+    for op, av in _iter_repeats(items):
+        chars |= _first(av[2])[0]
+    for char in sorted(chars)[:8]:
+        yield lambda length, char=char: char * length + '\x00'
+    pair = ''.join(sorted(chars)[:2])
+    if len(pair) == 2:
+        yield lambda length: pair * (length // 2) + '\x00'
+
+
+def _iter_repeats(items):
+    for op, av in items:
+        if op in _REPEATS:
+            yield op, av
+            yield from _iter_repeats(av[2])
+        elif op is sre_constants.SUBPATTERN:
+            yield from _iter_repeats(av[-1])
+        elif op is sre_constants.BRANCH:
+            for branch in av[1]:
+                yield from _iter_repeats(branch)
+
+
+def _fuzz(regex, parsed, deadline):
+    deadline = min(deadline, time.perf_counter() + _FUZZ_TOTAL)
+    for make_input in _fuzz_inputs(parsed):
+        length = 2
+        while length <= _FUZZ_MAX_LENGTH and time.perf_counter() < deadline:
+            text = make_input(length)
+            started = time.perf_counter()
+            regex.search(text)
+            if time.perf_counter() - started > FUZZ_BUDGET:
+                return True
+            # Grow slowly while inputs are short so an exponential pattern
+            # crosses the budget before a single run can take long.
+            length = length + 2 if length < 64 else int(length * 1.5)
+    return False
+
+
+def check(regex, fuzz=False, deadline=None):
+    """Return the reasons regex is unsafe to run on large diffs, if any.
+
+    With fuzz, inputs of growing length built from the characters the
+    pattern repeats are also timed, stopping at the first slow one or at
+    the time.perf_counter() deadline, if given.
+    """
+    try:
+        parsed = sre_parse.parse(regex.pattern, regex.flags)
+    except (re.error, OverflowError, RecursionError):
+        return []
+    problems = set()
+    _walk(parsed, problems)
+    if deadline is None:
+        deadline = float('inf')
+    if fuzz and not problems and _fuzz(regex, parsed, deadline):
+        problems.add(SLOW_MATCH)
+    return sorted(problems)
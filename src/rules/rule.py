@@ -1,11 +1,56 @@
+import itertools
 import re
+import sre_constants
+import sre_parse
 
 from config import config
 
 
+def _globs(value):
+    # A bare string would be split into one character globs, '*' among them.
+    if value is None:
+        return []
+    if not isinstance(value, list) or not all(isinstance(glob, str) for glob in value):
+        raise TypeError('paths and exclude must be lists of globs')
+    return value
+
+
+_START_ANCHORS = (sre_constants.AT_BEGINNING, sre_constants.AT_BEGINNING_STRING)
+_REPEATS = (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT)
+
+
+def _looks_before(items):
+    """Return True if items anchor to the start of the text or look behind."""
+    for op, av in items:
+        if op is sre_constants.AT and av in _START_ANCHORS:
+            return True
+        if op in (sre_constants.ASSERT, sre_constants.ASSERT_NOT):
+            direction, sub = av
+            if direction < 0 or _looks_before(sub):
+                return True
+        elif op is sre_constants.SUBPATTERN and _looks_before(av[-1]):
+            return True
+        elif op is sre_constants.BRANCH and any(_looks_before(branch) for branch in av[1]):
+            return True
+        elif op in _REPEATS and _looks_before(av[2]):
+            return True
+        elif op is sre_constants.GROUPREF_EXISTS and any(
+                _looks_before(branch) for branch in av[1:] if branch is not None):
+            return True
+    return False
+
+
 class BarrelmanPatternRule:
-    def __init__(self, pattern, watchers):
+    def __init__(self, pattern, watchers, paths=None, exclude=None):
         self.pattern = pattern
+        self.regex = re.compile(pattern)
+        # '^', '\A' and lookbehinds would see the text before pos when matched
+        # on a window of a larger buffer, so such patterns get their own copy
+        # of the text and anchor to the start of each file.
+        self.looks_before = _looks_before(sre_parse.parse(pattern))
+        # Globs limiting which files of the diff the rule is checked against.
+        self.paths = list(_globs(paths))
+        self.exclude = list(_globs(exclude))
         self.users, self.teams = [], []
         for watcher in watchers:
             if watcher.startswith('team/'):
@@ -13,11 +58,25 @@ class BarrelmanPatternRule:
             else:
                 self.users.append(watcher)
 
-    def check_rule(self, diff):
-        matches = re.findall(self.pattern, diff)
-        if len(matches) > 0:
-            return self.users, self.teams
-        return [], []
+    def search(self, text, pos=0, endpos=None):
+        """Return the first match in text[pos:endpos], or None."""
+        if endpos is None:
+            endpos = len(text)
+        if self.looks_before and (pos or endpos != len(text)):
+            return self.regex.search(text[pos:endpos])
+        return self.regex.search(text, pos, endpos)
+
+    def locations(self, diff, limit, pos=0, endpos=None):
+        """Return the spans of at most limit matches in diff[pos:endpos],
+        as offsets into diff.
+        """
+        if endpos is None:
+            endpos = len(diff)
+        if self.looks_before and (pos or endpos != len(diff)):
+            matches = itertools.islice(self.regex.finditer(diff[pos:endpos]), limit)
+            return [(start + pos, end + pos) for start, end in (match.span() for match in matches)]
+        matches = itertools.islice(self.regex.finditer(diff, pos, endpos), limit)
+        return [match.span() for match in matches]
 
     def __str__(self):
         tagged_users = [user for user in self.users]
@@ -1,15 +1,57 @@
+from parser import structured_diff
+from rules import rule_set
+
 
 class RuleChecker:
-    def __init__(self, rules):
-        self.rules = rules
+    def __init__(self, rules, max_locations=0):
+        if not isinstance(rules, rule_set.RuleSet):
+            rules = rule_set.RuleSet(rules)
+        self.rule_set = rules
+        self.rules = rules.rules
         self.users_to_notify = set()
         self.teams_to_notify = set()
         self.triggered_regex_rules = []
+        # Paths of the files each triggered rule matched in, for structured diffs.
+        self.triggered_files = {}
+        # Spans of the first max_locations matches of each triggered rule,
+        # offsets into the diff text or the structured diff's buffer.
+        self.max_locations = max_locations
+        self.match_locations = {}
+        # Rules that could not be checked before the matching budget ran out.
+        self.timed_out_rules = []
 
     def check_rules(self, diff):
-        for rule in self.rules:
-            users, teams = rule.check_rule(diff)
-            self.users_to_notify.update(users)
-            self.teams_to_notify.update(teams)
-            if users or teams:
-                self.triggered_regex_rules.append(rule)
+        if isinstance(diff, structured_diff.Diff):
+            for diff_file in diff.files:
+                self.check_file(diff, diff_file)
+        else:
+            self.check_text(diff, 0, len(diff), None)
+
+    def check_file(self, diff, diff_file):
+        """Check one file of a structured diff, return the rules it triggered."""
+        if diff_file.start == diff_file.end:
+            return []
+        return self.check_text(diff.buffer, diff_file.start, diff_file.end, diff_file.path)
+
+    def check_text(self, text, start, end, path):
+        triggered = []
+        for rule in self.rule_set.match(text, start, end, path):
+            if not (rule.users or rule.teams):
+                continue
+            triggered.append(rule)
+            self.record(rule, path)
+            remaining = self.max_locations - len(self.match_locations[rule])
+            if remaining > 0:
+                self.match_locations[rule].extend(rule.locations(text, remaining, start, end))
+        return triggered
+
+    def record(self, rule, path=None, locations=()):
+        """Note that rule matched, in the file at path when it is given."""
+        if rule not in self.match_locations:
+            self.users_to_notify.update(rule.users)
+            self.teams_to_notify.update(rule.teams)
+            self.triggered_regex_rules.append(rule)
+            self.match_locations[rule] = []
+        if path is not None:
+            self.triggered_files.setdefault(rule, []).append(path)
+        self.match_locations[rule].extend(locations)
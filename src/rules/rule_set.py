@@ -0,0 +1,213 @@
+import re
+import sre_constants
+import sre_parse
+
+import cachetools
+
+from rules import globs, literals
+
+# Patterns that refer to their own groups or set global flags change meaning
+# once they are embedded in a larger alternation, so they are matched alone.
+_GROUP_REFERENCE = re.compile(r'\\[1-9]|\(\?\(')
+
+# Below this many characters, searching each candidate rule on its own is
+# cheaper than compiling a combined scanner for the candidates.
+_MERGE_MIN_LENGTH = 64 * 1024
+
+
+_CATEGORIES = {
+    sre_constants.CATEGORY_DIGIT: r'\d',
+    sre_constants.CATEGORY_NOT_DIGIT: r'\D',
+    sre_constants.CATEGORY_SPACE: r'\s',
+    sre_constants.CATEGORY_NOT_SPACE: r'\S',
+    sre_constants.CATEGORY_WORD: r'\w',
+    sre_constants.CATEGORY_NOT_WORD: r'\W',
+}
+
+
+def _mergeable(regex):
+    if regex.flags & ~re.UNICODE:
+        return False
+    if regex.groupindex:
+        return False
+    return _GROUP_REFERENCE.search(regex.pattern) is None
+
+
+def _char_class(op, av):
+    """Return a regex for the characters a single character node matches."""
+    if op is sre_constants.LITERAL:
+        return re.escape(chr(av))
+    if op is sre_constants.NOT_LITERAL:
+        return '[^' + re.escape(chr(av)) + ']'
+    if op is sre_constants.ANY:
+        return '.'
+    if op is not sre_constants.IN:
+        return None
+    members = []
+    for item_op, item_av in av:
+        if item_op is sre_constants.NEGATE:
+            members.append('^')
+        elif item_op is sre_constants.LITERAL:
+            members.append(re.escape(chr(item_av)))
+        elif item_op is sre_constants.RANGE:
+            members.append(re.escape(chr(item_av[0])) + '-' + re.escape(chr(item_av[1])))
+        elif item_op is sre_constants.CATEGORY and item_av in _CATEGORIES:
+            members.append(_CATEGORIES[item_av])
+        else:
+            return None
+    return '[' + ''.join(members) + ']'
+
+
+def _run_start_guard(rule):
+    r"""Return a lookbehind that keeps searches for rule from starting inside
+    a run of the characters its leading repeat takes, or ''.
+
+    A pattern like '[\w.]+@' is otherwise tried from every position of a long
+    run of such characters, each time taking the rest of the run: quadratic.
+    Whenever a match starts inside a run, one starts where the run starts,
+    as the repeat can take the characters before it as well, so searching
+    only from run starts finds the same leftmost match. Files are preceded
+    by the newline ending the file before them, so classes that take a
+    newline are left alone.
+    """
+    if not _mergeable(rule.regex) or rule.looks_before:
+        return ''
+    parsed = sre_parse.parse(rule.pattern)
+    if not len(parsed):
+        return ''
+    op, av = parsed[0]
+    if op not in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT):
+        return ''
+    _, maximum, sub = av
+    if maximum != sre_constants.MAXREPEAT or len(sub) != 1:
+        return ''
+    char_class = _char_class(*sub[0])
+    if char_class is None or re.match(char_class, '\n'):
+        return ''
+    return f'(?<!{char_class})'
+
+
+class RuleSet:
+    """A compiled set of rules that is matched against a diff in one pass.
+
+    Rules whose pattern requires a literal are only considered when a
+    LiteralIndex finds that literal in the text. Mergeable candidates are
+    joined into a single alternation that finds the leftmost offset where
+    any of them matches, and every candidate that has not fired yet is tried
+    at that offset, so overlapping matches are never lost and the text is
+    only walked forward once. When only rules that already fired match, the
+    scanner is rebuilt without them.
+    """
+
+    def __init__(self, rules):
+        self.rules = list(rules)
+        self._mergeable = set()
+        self._literals = {}
+        self._guards = {}
+        self._guarded = {}
+        for index, rule in enumerate(self.rules):
+            if _mergeable(rule.regex) and not rule.looks_before:
+                self._mergeable.add(index)
+            guard = _run_start_guard(rule)
+            if guard:
+                try:
+                    self._guarded[index] = re.compile(guard + rule.pattern)
+                    self._guards[index] = guard
+                except re.error:
+                    pass
+            literal = literals.required_literal(rule.regex)
+            if literal is not None:
+                self._literals[index] = literal
+        self._literal_index = literals.LiteralIndex(self._literals.values())
+        self._compile_globs()
+        self._scanners = cachetools.LRUCache(maxsize=32)
+
+        try:
+            self._scanner(tuple(sorted(self._mergeable)))
+        except re.error:
+            self._mergeable = set()
+
+    def _compile_globs(self):
+        all_globs = sorted({glob for rule in self.rules for glob in rule.paths + rule.exclude})
+        self._glob_set = globs.GlobSet(all_globs) if all_globs else None
+        glob_index = {glob: index for index, glob in enumerate(all_globs)}
+        self._includes = [{glob_index[glob] for glob in rule.paths} for rule in self.rules]
+        self._excludes = [{glob_index[glob] for glob in rule.exclude} for rule in self.rules]
+
+    def applies(self, path):
+        """Return the set of indexes of rules that apply to the file at path."""
+        if path is None or self._glob_set is None:
+            return set(range(len(self.rules)))
+        matched = self._glob_set.matching(path)
+        return {index for index in range(len(self.rules))
+                if (not self._includes[index] or self._includes[index] & matched)
+                and not self._excludes[index] & matched}
+
+    def _scanner(self, indexes):
+        try:
+            return self._scanners[indexes]
+        except KeyError:
+            pass
+        # Capturing groups would stop sre from using the prefix and charset
+        # of the alternation to skip ahead, so the scanner only finds where
+        # some rule matches and the rules themselves say which ones.
+        alternation = '|'.join(f'(?:{self._guards.get(index, "")}{self.rules[index].pattern})'
+                               for index in indexes)
+        scanner = self._scanners[indexes] = re.compile(alternation)
+        return scanner
+
+    def candidates(self, text, pos=0, endpos=None, path=None):
+        """Return rules that apply to path and whose required literal is in text."""
+        applicable = self.applies(path)
+        if not applicable:
+            return []
+        present = self._literal_index.present(text, pos, endpos)
+        return [index for index in sorted(applicable)
+                if index not in self._literals or self._literals[index] in present]
+
+    def match(self, text, pos=0, endpos=None, path=None):
+        """Return the rules whose pattern matches text, in rule order.
+
+        When path is given only the rules scoped to that file are checked.
+        """
+        if endpos is None:
+            endpos = len(text)
+        candidates = self.candidates(text, pos, endpos, path)
+        fired = set()
+
+        merged = [index for index in candidates if index in self._mergeable]
+        alone = candidates
+        if len(merged) > 1 and endpos - pos >= _MERGE_MIN_LENGTH:
+            fired.update(self._scan(merged, text, pos, endpos))
+            alone = [index for index in candidates if index not in self._mergeable]
+
+        for index in alone:
+            guarded = self._guarded.get(index)
+            if guarded is not None:
+                found = guarded.search(text, pos, endpos)
+            else:
+                found = self.rules[index].search(text, pos, endpos)
+            if found is not None:
+                fired.add(index)
+
+        return [self.rules[index] for index in sorted(fired)]
+
+    def _scan(self, indexes, text, pos, endpos):
+        fired = set()
+        active = tuple(indexes)
+        scanner = self._scanner(active)
+        while active:
+            found = scanner.search(text, pos, endpos)
+            if found is None:
+                break
+            start = found.start()
+            hit = [index for index in active if index not in fired
+                   and self.rules[index].regex.match(text, start, endpos) is not None]
+            fired.update(hit)
+            if not hit:
+                # Only rules that already fired match here.
+                active = tuple(index for index in active if index not in fired)
+                if active:
+                    scanner = self._scanner(active)
+            pos = start + 1
+        return fired
@@ -0,0 +1,63 @@
+import re
+
+import pytest
+
+from rules import globs
+
+
+@pytest.mark.parametrize('glob,path,matches', [
+    # A glob without a slash matches a file or directory name at any depth.
+    ('*.py', 'app.py', True),
+    ('*.py', 'src/app.py', True),
+    ('*.py', 'src/app.pyc', False),
+    ('setup.py', 'pkg/setup.py', True),
+    ('vendor', 'vendor/lib/x.js', True),
+    ('vendor', 'src/vendor/x.js', True),
+    ('vendor', 'vendors/x.js', False),
+    ('vendor/', 'src/vendor/x.js', True),
+    # '*' and '?' stay within a directory.
+    ('src/*.py', 'src/app.py', True),
+    ('src/*.py', 'src/pkg/app.py', False),
+    ('src/?.py', 'src/a.py', True),
+    ('src/?.py', 'src/ab.py', False),
+    # '**' spans directories.
+    ('**/*.py', 'app.py', True),
+    ('**/*.py', 'src/pkg/app.py', True),
+    ('src/**', 'src/pkg/app.py', True),
+    ('src/**/test_*.py', 'src/test_a.py', True),
+    ('src/**/test_*.py', 'src/pkg/test/test_a.py', True),
+    ('src/**/test_*.py', 'lib/src/test_a.py', False),
+    # A glob with a slash, or a leading one, is relative to the repo root.
+    ('docs/api', 'docs/api/index.md', True),
+    ('docs/api', 'src/docs/api/index.md', False),
+    ('/Makefile', 'Makefile', True),
+    ('/Makefile', 'src/Makefile', False),
+    # Character classes.
+    ('*.[ch]', 'src/main.c', True),
+    ('*.[ch]', 'src/main.o', False),
+    ('*.[!ch]', 'src/main.o', True),
+    ('*.[!ch]', 'src/main.c', False),
+    ('[', '[', True),
+])
+def test_translate(glob, path, matches):
+    regex = re.compile(globs.translate(glob), re.DOTALL)
+    assert (regex.fullmatch(path) is not None) == matches
+
+
+def test_glob_set():
+    glob_set = globs.GlobSet(['*.py', 'vendor/**', '/setup.py', 'docs/'])
+    assert glob_set.matching('setup.py') == {0, 2}
+    assert glob_set.matching('vendor/pkg/setup.py') == {0, 1}
+    assert glob_set.matching('docs/index.md') == {3}
+    assert glob_set.matching('README.md') == set()
+
+
+def test_glob_set_agrees_with_translate():
+    patterns = ['*.py', '**/test_*.py', 'src/*', 'node_modules/', '*.min.js', '/go.sum']
+    glob_set = globs.GlobSet(patterns)
+    paths = ['a.py', 'src/test_a.py', 'src/pkg/b.py', 'web/node_modules/x.js',
+             'dist/app.min.js', 'go.sum', 'mod/go.sum']
+    for path in paths:
+        expected = {index for index, glob in enumerate(patterns)
+                    if re.fullmatch(globs.translate(glob), path, re.DOTALL)}
+        assert glob_set.matching(path) == expected
@@ -0,0 +1,48 @@
+import re
+
+import pytest
+
+from rules import literals
+
+
+@pytest.mark.parametrize('pattern,literal', [
+    ('import requests', 'import requests'),
+    (r'requests\.(get|post)\(', 'requests.'),
+    (r'^from (os|sys) import', ' import'),
+    (r'\bpassword\s*=', 'password'),
+    (r'api_(key|secret)+_v2', 'api_'),
+    (r'(?:ab)+cdef', 'cdef'),
+    (r'x(?:yz)?w', 'x'),
+    (r'(?i:TODO)fixme', 'fixme'),
+    (r'\d+', None),
+    (r'a|b', None),
+    (r'(?i)secret', None),
+])
+def test_required_literal(pattern, literal):
+    assert literals.required_literal(re.compile(pattern)) == literal
+
+
+@pytest.mark.parametrize('pattern', [
+    'import requests', r'requests\.(get|post)\(', r'api_(key|secret)+_v2', r'x(?:yz)?w',
+])
+def test_required_literal_in_every_match(pattern):
+    regex = re.compile(pattern)
+    literal = literals.required_literal(regex)
+    text = 'import requests; requests.get(1); api_keysecret_v2; xw; xyzw'
+    for match in regex.finditer(text):
+        assert literal in match.group()
+
+
+def test_present():
+    index = literals.LiteralIndex(['import', 'import os', 'port', 'requests', 'missing'])
+    assert index.present('import os\nimport requests\n') == {'import', 'import os', 'port', 'requests'}
+    assert index.present('export') == {'port'}
+    assert index.present('') == set()
+
+
+def test_present_bounds():
+    index = literals.LiteralIndex(['import os', 'os'])
+    text = 'import os\nx = 1\n'
+    assert index.present(text, 2) == {'os'}
+    assert index.present(text, 0, 8) == set()
+    assert index.present(text, 0, 9) == {'import os', 'os'}
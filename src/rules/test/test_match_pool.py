@@ -0,0 +1,87 @@
+import asyncio
+import multiprocessing
+
+import pytest
+
+from parser import parser, structured_diff
+from rules import match_pool
+
+_YML = '''
+import requests: [someone]
+secret_\\w+: [team/reviewers]
+never matches: [nobody]
+'''
+
+_DIFF = ''.join(f'diff --git a/{path} b/{path}\n--- a/{path}\n+++ b/{path}\n@@ -0,0 +1 @@\n+{line}\n'
+                for path, line in (('a.py', 'import requests'), ('b.py', 'secret_token = 1')))
+
+
+async def _check(pool, yml=_YML):
+    # Workers parse yml themselves; the rules must come from the same file.
+    rules = parser.RuleCache().parse(_YML)
+    return await pool.check(yml, rules, structured_diff.parse(_DIFF), max_locations=1)
+
+
+async def _wait_idle(pool):
+    while pool.stats()['idle'] < pool.workers:
+        await asyncio.sleep(0.01)
+
+
+@pytest.mark.asyncio
+async def test_same_as_event_loop():
+    inline = await _check(match_pool.MatchPool())
+    pool = match_pool.MatchPool()
+    pool.start(workers=1, timeout=30)
+    try:
+        checker = await _check(pool)
+    finally:
+        pool.close()
+    assert checker.users_to_notify == {'someone'}
+    assert checker.teams_to_notify == {'reviewers'}
+    assert list(checker.triggered_files.values()) == [['a.py'], ['b.py']]
+    assert list(checker.match_locations.values()) == list(inline.match_locations.values())
+    assert checker.timed_out_rules == []
+    assert pool.stats()['tasks'] == 1
+
+
+@pytest.mark.asyncio
+async def test_timeout_restarts_worker():
+    pool = match_pool.MatchPool()
+    pool.start(workers=1, timeout=0.0)
+    try:
+        checker = await _check(pool)
+        patterns = [rule.pattern for rule in checker.timed_out_rules]
+        assert patterns == ['import requests', r'secret_\w+', 'never matches']
+        assert pool.stats()['timeouts'] == 1
+        # The worker comes back once it was replaced, and works again.
+        await asyncio.wait_for(_wait_idle(pool), 30)
+        pool.timeout = 30
+        checker = await _check(pool)
+        assert checker.timed_out_rules == []
+        assert checker.users_to_notify == {'someone'}
+    finally:
+        pool.close()
+
+
+@pytest.mark.asyncio
+async def test_error_restarts_worker():
+    pool = match_pool.MatchPool()
+    pool.start(workers=1, timeout=30)
+    try:
+        with pytest.raises(RuntimeError):
+            await _check(pool, yml='- not a mapping\n')
+        assert pool.stats()['errors'] == 1
+        await asyncio.wait_for(_wait_idle(pool), 30)
+        assert (await _check(pool)).users_to_notify == {'someone'}
+    finally:
+        pool.close()
+
+
+@pytest.mark.asyncio
+async def test_close_stops_workers():
+    pool = match_pool.MatchPool()
+    pool.start(workers=2, timeout=30)
+    assert len(multiprocessing.active_children()) == 2
+    pool.close()
+    assert multiprocessing.active_children() == []
+    assert pool.stats()['workers'] == 0
@@ -0,0 +1,58 @@
+import re
+import time
+
+import pytest
+
+from parser import parser
+from rules import redos
+
+
+@pytest.mark.parametrize('pattern,problem', [
+    (r'(a+)+$', redos.NESTED_QUANTIFIERS),
+    (r'(\w*)*x', redos.NESTED_QUANTIFIERS),
+    (r'(?:\s+\S*)+end', redos.NESTED_QUANTIFIERS),
+    (r'(a|a)*b', redos.OVERLAPPING_ALTERNATION),
+    (r'(ab|\wc)+!', redos.OVERLAPPING_ALTERNATION),
+    (r'\d+\d+x', redos.AMBIGUOUS_REPEATS),
+    (r'(?:\.\d+)+\d+x', redos.AMBIGUOUS_REPEATS),
+    (r'\w+\d+x', redos.AMBIGUOUS_REPEATS),
+])
+def test_flagged(pattern, problem):
+    assert problem in redos.check(re.compile(pattern))
+
+
+@pytest.mark.parametrize('pattern', [
+    'import requests',
+    r'requests\.(get|post)\(',
+    r'(ab)+c',
+    r'(a|b)*c',
+    # Single character alternatives are parsed into one character class.
+    r'(\w|\d)+!',
+    r'\d+\.\d+',
+    # Every iteration ends with a dot, so the repeats cannot share digits.
+    r'(?:\d+\.)+\d+',
+    r'v?\d+(?:\.\d+)+',
+    r'(?:\w+\.)*\w+\(',
+    r'\w+(?:\.\w+)+',
+    r'[0-9a-f]{40}',
+    r'\bpassword\s*=\s*\S+',
+    r'^from (os|sys) import \w+$',
+])
+def test_accepted(pattern):
+    assert redos.check(re.compile(pattern)) == []
+
+
+def test_fuzz_accepts_safe_pattern():
+    assert redos.check(re.compile(r'\s*\w+ = \d+'), fuzz=True) == []
+
+
+def test_fuzz_deadline():
+    # A deadline that already passed skips the fuzzing, not the static checks.
+    past = time.perf_counter() - 1
+    assert redos.check(re.compile(r'(a+)+$'), fuzz=True, deadline=past) == [redos.NESTED_QUANTIFIERS]
+    assert redos.check(re.compile(r'\s*\w+ = \d+'), fuzz=True, deadline=past) == []
+
+
+def test_version_rule_keeps_file():
+    rules = parser.parse_barrel_rules("'import requests': [a]\n'(?:\\d+\\.)+\\d+': [b]\n")
+    assert [rule.pattern for rule in rules] == ['import requests', r'(?:\d+\.)+\d+']
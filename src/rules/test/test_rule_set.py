@@ -0,0 +1,154 @@
+import pytest
+
+from parser import structured_diff
+from rules import rule_checker, rule_set
+from rules.rule import BarrelmanPatternRule
+
+# Long enough for RuleSet.match to merge candidates into one scanner.
+_FILLER = 'x = 1\n' * (rule_set._MERGE_MIN_LENGTH // 6 + 1)
+
+_PATTERNS = [
+    'import requests',
+    r'requests\.(get|post)',
+    r'\bsecret_\w+',
+    r'^import os$',
+    r'(?m)^import os$',
+    r'(?i)TODO',
+    r'(?P<name>api)_key',
+    r'(\w+) = \1',
+    r'x = \d+\nimport',
+    r'foo(?=bar)',
+    r'(?<!un)safe',
+    r'\Aimport',
+    r'(?<=\n)x =',
+    r'[0-9a-f]{40}',
+    r'[\w.]+@[\w.]+',
+    r'\w+foo',
+    r'[^\s=]*= \d',
+]
+
+_TEXTS = [
+    '',
+    'import requests\nrequests.get(url)\n',
+    'secret_token = 1\nunsafe()\n',
+    'import os\n',
+    'before\nimport os\nafter\n',
+    'todo: api_key = api_key\nfoobar\nsafe\n',
+    'da39a3ee5e6b4b0d3255bfef95601890afd80709\n',
+    'unsafe foobaz requests.put()\n',
+    'mail a.b@c.d and barfoo\n',
+    'x' * 500 + '@\n',
+]
+
+
+def _expected(rules, text, pos=0, endpos=None):
+    # Rules match as if text[pos:endpos] was all there is.
+    return [rule for rule in rules if rule.regex.search(text[pos:endpos]) is not None]
+
+
+@pytest.mark.parametrize('filler', ['', _FILLER], ids=['short', 'merged'])
+@pytest.mark.parametrize('text', _TEXTS)
+def test_match_equals_search(text, filler):
+    rules = [BarrelmanPatternRule(pattern, ['someone']) for pattern in _PATTERNS]
+    for text in (filler + text, text + filler):
+        assert rule_set.RuleSet(rules).match(text) == _expected(rules, text)
+
+
+def test_match_within_bounds():
+    rules = [BarrelmanPatternRule(pattern, ['someone']) for pattern in _PATTERNS]
+    text = 'import requests\n' + _FILLER + 'secret_token\n' + _FILLER + 'import os\n'
+    rules_set = rule_set.RuleSet(rules)
+    start = len('import requests\n')
+    end = len(text) - len('import os\n')
+    assert rules_set.match(text, start, end) == _expected(rules, text, start, end)
+    patterns = [rule.pattern for rule in rules_set.match(text, start, end)]
+    assert r'\bsecret_\w+' in patterns
+    assert 'import requests' not in patterns and r'^import os$' not in patterns
+
+
+def test_overlapping_matches():
+    # Both rules match at the same offset; the merged scanner reports one.
+    rules = [BarrelmanPatternRule('password', ['a']), BarrelmanPatternRule('pass', ['b'])]
+    text = _FILLER + 'password\n'
+    assert rule_set.RuleSet(rules).match(text) == rules
+
+
+def test_unmergeable_pattern():
+    rules = [BarrelmanPatternRule(r'(?P<x>a)(?P=x)', ['a']),
+             BarrelmanPatternRule(r'(b)\1', ['b']),
+             BarrelmanPatternRule('cc', ['c'])]
+    rules_set = rule_set.RuleSet(rules)
+    assert rules_set._mergeable == {2}
+    text = _FILLER + 'aa bb cc\n'
+    assert rules_set.match(text) == rules
+
+
+def test_path_scoped_rules():
+    rules = [
+        BarrelmanPatternRule('import', ['a']),
+        BarrelmanPatternRule('import', ['b'], paths=['**/*.py']),
+        BarrelmanPatternRule('import', ['c'], paths=['*.py'], exclude=['vendor/**']),
+        BarrelmanPatternRule('import', ['d'], paths=['/docs/']),
+    ]
+    rules_set = rule_set.RuleSet(rules)
+    text = 'import os\n'
+    assert rules_set.match(text, path='src/app.py') == rules[:3]
+    assert rules_set.match(text, path='vendor/lib/app.py') == rules[:2]
+    assert rules_set.match(text, path='docs/index.md') == [rules[0], rules[3]]
+    assert rules_set.match(text, path='src/docs/index.md') == [rules[0]]
+    # Without a path every rule applies.
+    assert rules_set.match(text) == rules
+
+
+def test_candidates_need_literal():
+    rules = [BarrelmanPatternRule(r'import \w+', ['a']),
+             BarrelmanPatternRule(r'\d+', ['b'])]
+    rules_set = rule_set.RuleSet(rules)
+    assert rules_set.candidates('x = 1') == [1]
+    assert rules_set.candidates('import os') == [0, 1]
+
+
+def test_anchors_per_file():
+    rules = [BarrelmanPatternRule(r'^import os', ['a']),
+             BarrelmanPatternRule(r'\Aimport os$', ['b']),
+             BarrelmanPatternRule(r'(?<![\w\n])import', ['c'])]
+    rules_set = rule_set.RuleSet(rules)
+    text = 'import os\n' + 'import os\n' + 'x = 1\nimport os\n'
+    first, second, third = (0, 10), (10, 20), (20, len(text))
+    assert rules_set.match(text, *first) == rules
+    assert rules_set.match(text, *second) == rules
+    assert rules_set.match(text, *third) == []
+    assert rules[0].locations(text, 5, *second) == [(10, 19)]
+    assert rules[1].locations(text, 5, *third) == []
+
+
+def test_anchors_independent_of_file_order():
+    files = ''.join(f'diff --git a/{path} b/{path}\n--- a/{path}\n+++ b/{path}\n@@ -0,0 +1 @@\n+import os\n'
+                    for path in ('a.py', 'b.py'))
+    checker = rule_checker.RuleChecker([BarrelmanPatternRule(r'^import os$', ['a'])])
+    checker.check_rules(structured_diff.parse(files))
+    assert list(checker.triggered_files.values()) == [['a.py', 'b.py']]
+
+
+@pytest.mark.parametrize('pattern,guard', [
+    (r'[\w.]+@[\w.]+', r'(?<![\w\.])'),
+    (r'\d*?x', r'(?<![\d])'),
+    (r'a+b', r'(?<!a)'),
+    (r'.+x', r'(?<!.)'),
+    # Classes taking a newline would skip the first run of a file.
+    (r'[^a-z]+x', ''),
+    (r'\s+x', ''),
+    (r'x\w+', ''),
+    (r'\w{1,5}x', ''),
+    (r'(\w)+x\1', ''),
+    (r'^\w+x', ''),
+])
+def test_run_start_guard(pattern, guard):
+    assert rule_set._run_start_guard(BarrelmanPatternRule(pattern, ['a'])) == guard
+
+
+def test_leading_repeat_in_long_run():
+    rules = [BarrelmanPatternRule(r'[\w.]+@[\w.]+', ['a'])]
+    rules_set = rule_set.RuleSet(rules)
+    assert rules_set.match('a' * 100000 + ' @') == []
+    assert rules_set.match('a' * 100000 + '@b') == rules
@@ -0,0 +1,77 @@
+"""
+Coalescing of pull request events. When several events for the same pull
+request arrive close together only the latest is evaluated: events wait a
+short debounce delay before dispatch and are dropped if a newer one arrived
+meanwhile, and a run already in flight can ask whether it is still current
+before it writes anything.
+"""
+import asyncio
+
+# Events that trigger a full check of the pull request.
+COALESCED = {('pull_request', 'opened'), ('pull_request', 'synchronize')}
+
+
+def _key(event):
+    if (event.event, event.data.get('action')) not in COALESCED:
+        return None
+    return event.data['repository']['full_name'], event.data['pull_request']['number']
+
+
+class _Latest:
+    __slots__ = ('event', 'arrived', 'pending')
+
+    def __init__(self):
+        self.event = None
+        self.arrived = 0.0
+        # Tracked events for the pull request that have not finished yet.
+        self.pending = 0
+
+
+class Coalescer:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self._latest = {}
+        self.superseded = 0
+
+    def track(self, event):
+        """Record event as the latest for its pull request."""
+        key = _key(event)
+        if key is None:
+            return
+        latest = self._latest.setdefault(key, _Latest())
+        latest.event = event
+        latest.arrived = asyncio.get_event_loop().time()
+        latest.pending += 1
+
+    def is_current(self, event):
+        """Return False if a newer event for the same pull request arrived."""
+        latest = self._latest.get(_key(event))
+        return latest is None or latest.event is event
+
+    async def run(self, event, dispatch):
+        """Dispatch event once the latest event for its pull request is old
+        enough, unless a newer one replaced it.
+        """
+        latest = self._latest.get(_key(event))
+        if latest is None:
+            await dispatch(event)
+            return
+        try:
+            wait = latest.arrived + self.delay - asyncio.get_event_loop().time()
+            while wait > 0 and latest.event is event:
+                await asyncio.sleep(wait)
+                wait = latest.arrived + self.delay - asyncio.get_event_loop().time()
+            if latest.event is not event:
+                self.superseded += 1
+                return
+            await dispatch(event)
+        finally:
+            latest.pending -= 1
+            if not latest.pending:
+                del self._latest[_key(event)]
+
+    def stats(self):
+        return {
+            'pending': len(self._latest),
+            'superseded': self.superseded,
+        }
@@ -0,0 +1,75 @@
+"""
+Sets of recently seen webhook delivery ids, so redelivered events are not
+processed twice. Entries expire after a TTL. The in-memory set is private
+to one process; the SQLite set can be shared by processes on one host, and
+other backends only need the same add() and discard() methods.
+"""
+import collections
+import sqlite3
+import time
+
+
+class MemorySeenSet:
+    def __init__(self, ttl, maxsize=10000):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._expiry = collections.OrderedDict()
+
+    def add(self, key):
+        """Remember key, return False if it was already seen."""
+        now = time.monotonic()
+        while self._expiry:
+            oldest, expires = next(iter(self._expiry.items()))
+            if expires > now and len(self._expiry) < self.maxsize:
+                break
+            del self._expiry[oldest]
+        if key in self._expiry:
+            return False
+        self._expiry[key] = now + self.ttl
+        return True
+
+    def discard(self, key):
+        """Forget key so a later delivery of it is processed."""
+        self._expiry.pop(key, None)
+
+    def __len__(self):
+        return len(self._expiry)
+
+
+class SqliteSeenSet:
+    # Expired rows are removed once every this many additions.
+    _PURGE_EVERY = 1000
+
+    def __init__(self, ttl, path):
+        self.ttl = ttl
+        self._conn = sqlite3.connect(path, isolation_level=None, timeout=5)
+        self._conn.execute('CREATE TABLE IF NOT EXISTS seen (key TEXT PRIMARY KEY, expires REAL NOT NULL)')
+        self._additions = 0
+
+    def add(self, key):
+        """Remember key, return False if it was already seen."""
+        now = time.time()
+        self._additions += 1
+        if self._additions % self._PURGE_EVERY == 0:
+            self._conn.execute('DELETE FROM seen WHERE expires <= ?', (now,))
+        self._conn.execute('DELETE FROM seen WHERE key = ? AND expires <= ?', (key, now))
+        cursor = self._conn.execute('INSERT OR IGNORE INTO seen VALUES (?, ?)', (key, now + self.ttl))
+        return cursor.rowcount == 1
+
+    def discard(self, key):
+        """Forget key so a later delivery of it is processed."""
+        self._conn.execute('DELETE FROM seen WHERE key = ?', (key,))
+
+    def __len__(self):
+        return self._conn.execute('SELECT COUNT(*) FROM seen WHERE expires > ?', (time.time(),)).fetchone()[0]
+
+    def close(self):
+        self._conn.close()
+
+
+def create(backend, ttl, maxsize=10000, path=None):
+    if backend == 'memory':
+        return MemorySeenSet(ttl, maxsize)
+    if backend == 'sqlite':
+        return SqliteSeenSet(ttl, path)
+    raise ValueError(f'unknown deduplication backend {backend!r}')
@@ -0,0 +1,104 @@
+"""
+A write-ahead journal of accepted webhook events, kept in SQLite in WAL
+mode. Events are appended before they are acknowledged and marked done once
+processed; whatever is not done when the process stops is replayed on the
+next start. Events that failed for good, could not be decoded or were
+replayed too often are dropped, that is marked done without being processed.
+Done events are deleted in batches to keep the file small.
+"""
+import sqlite3
+
+from gidgethub import sansio
+
+
+class Journal:
+    # Done events are deleted and the WAL truncated once every this many.
+    COMPACT_EVERY = 500
+
+    def __init__(self, path, max_replays=3):
+        self.max_replays = max_replays
+        self._conn = sqlite3.connect(path, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        # Commits reach the OS at once but are only synced at checkpoints, so
+        # a crash of the process loses nothing and appends stay cheap.
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS events ('
+            'id INTEGER PRIMARY KEY, event TEXT NOT NULL, delivery_id TEXT, '
+            'content_type TEXT, body BLOB NOT NULL, '
+            'replays INTEGER NOT NULL DEFAULT 0, done INTEGER NOT NULL DEFAULT 0)')
+        self._ids = {}
+        self._done = 0
+        self.appended = 0
+        self.replayed = 0
+        self.dropped = 0
+
+    def append(self, event, body, content_type):
+        """Record event, received as body with content_type, until it is marked done."""
+        cursor = self._conn.execute(
+            'INSERT INTO events (event, delivery_id, content_type, body) VALUES (?, ?, ?, ?)',
+            (event.event, event.delivery_id, content_type, body))
+        self._ids[event] = cursor.lastrowid
+        self.appended += 1
+
+    def done(self, event):
+        event_id = self._ids.pop(event, None)
+        if event_id is None:
+            return
+        self._mark_done(event_id)
+
+    def drop(self, event):
+        """Mark event done although processing it failed, so it is not replayed."""
+        if event in self._ids:
+            self.dropped += 1
+        self.done(event)
+
+    def _mark_done(self, event_id):
+        self._conn.execute('UPDATE events SET done = 1 WHERE id = ?', (event_id,))
+        self._done += 1
+        if self._done % self.COMPACT_EVERY == 0:
+            self.compact()
+
+    def pending(self):
+        """Return the events that were never marked done, oldest first.
+
+        Events that were already replayed max_replays times, or whose body
+        cannot be decoded, are dropped instead.
+        """
+        events = []
+        rows = self._conn.execute(
+            'SELECT id, event, delivery_id, content_type, body, replays FROM events '
+            'WHERE done = 0 ORDER BY id').fetchall()
+        for event_id, name, delivery_id, content_type, body, replays in rows:
+            if replays >= self.max_replays:
+                self.dropped += 1
+                self._mark_done(event_id)
+                continue
+            try:
+                data = sansio._decode_body(content_type, body, strict=True)
+            except (KeyError, ValueError):
+                self.dropped += 1
+                self._mark_done(event_id)
+                continue
+            self._conn.execute('UPDATE events SET replays = replays + 1 WHERE id = ?', (event_id,))
+            event = sansio.Event(data, event=name, delivery_id=delivery_id)
+            self._ids[event] = event_id
+            events.append(event)
+        self.replayed += len(events)
+        return events
+
+    def compact(self):
+        self._conn.execute('DELETE FROM events WHERE done = 1')
+        self._conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+
+    def close(self):
+        self.compact()
+        self._conn.close()
+
+    def stats(self):
+        return {
+            'appended': self.appended,
+            'replayed': self.replayed,
+            'dropped': self.dropped,
+            'in_flight': len(self._ids),
+        }
@@ -1,13 +1,30 @@
 import asyncio
+import functools
 import sys
 
 from config import config
+import aiohttp
 from aiohttp import web
+import gidgethub
 from gidgethub import routing, sansio
-from rules import rule_checker
-from parser import parser
-
-router = routing.Router()
+from metrics import metrics
+from rules import match_pool
+from parser import parser, skip_policy, structured_diff
+from server import coalesce, dedup, journal, work_queue
+import utils
+
+router = routing.Router(concurrent=True)
+metrics.register('callbacks', router.callback_stats)
+rule_cache = parser.RuleCache()
+metrics.register('rule_cache', rule_cache.stats)
+matcher = match_pool.MatchPool()
+metrics.register('match_pool', matcher.stats)
+coalescer = coalesce.Coalescer()
+metrics.register('coalescer', coalescer.stats)
+
+# Failures that say nothing about the event, so replaying it can succeed
+_TRANSIENT_ERRORS = (gidgethub.GitHubBroken, gidgethub.RateLimitExceeded, gidgethub.CircuitOpen,
+                     aiohttp.ClientError, asyncio.TimeoutError, OSError)
 
 
 def hello(request):
@@ -18,18 +35,129 @@ async def healthz(request):
     return web.Response(text='OK')
 
 
+async def metrics_handler(request):
+    return web.json_response(metrics.snapshot())
+
+
 async def github_webhook_handler(request):
-    body = await request.read()
+    # Skip validating and decoding payloads nothing is registered for
+    event_type = request.headers.get('x-github-event')
+    if event_type != 'ping' and event_type not in router.event_types():
+        metrics.incr('ignored_events')
+        metrics.incr('ignored_event_bytes', request.content_length or 0)
+        return web.Response(status=200)
+
     secret = config.github_webhook_secret
-    event = sansio.Event.from_http(request.headers, body, secret=secret)
+    validator = None
+    if secret is not None and 'x-hub-signature' in request.headers:
+        validator = sansio.EventValidator(signature=request.headers['x-hub-signature'], secret=secret)
+    body = await _read_body(request, validator, config.max_body_bytes)
+    if body is None:
+        return web.Response(status=413, text='Payload too large')
+    event = sansio.Event.from_http(request.headers, body, secret=secret, validator=validator)
 
     if event.event == 'ping':
         return web.Response(status=200)
 
-    # Give GitHub some time to reach internal consistency.
-    await asyncio.sleep(1)
-    await router.dispatch(event, request.app.gh_api)
-    return web.Response(status=200)
+    actions = router.actions(event.event)
+    if actions is not None and event.data.get('action') not in actions:
+        metrics.incr('ignored_events')
+        return web.Response(status=200)
+
+    seen = request.app.seen_deliveries
+    if event.delivery_id and not seen.add(event.delivery_id):
+        metrics.incr('duplicate_deliveries')
+        return web.Response(status=200)
+
+    # Acknowledge right away, the work queue does the processing
+    if not request.app.work_queue.submit(event):
+        seen.discard(event.delivery_id)
+        return web.Response(status=503, text='Too many queued events')
+    coalescer.track(event)
+    if request.app.journal is not None:
+        request.app.journal.append(event, body, request.headers.get('content-type'))
+    return web.Response(status=202)
+
+
+async def _read_body(request, validator, limit):
+    """Read the body into one buffer, hashing chunks as they arrive.
+
+    Returns None once the body turns out to be larger than limit.
+    """
+    length = request.content_length
+    if length is not None and length > limit:
+        return None
+    body = bytearray(length or 0)
+    size = 0
+    while True:
+        chunk = await request.content.readany()
+        if not chunk:
+            break
+        if size + len(chunk) > limit:
+            return None
+        if validator is not None:
+            validator.update(chunk)
+        body[size:size + len(chunk)] = chunk
+        size += len(chunk)
+    del body[size:]
+    return body
+
+
+def _event_key(event):
+    """Events with the same key are processed in order, one at a time."""
+    repository = event.data.get('repository')
+    number = event.data.get('number') or event.data.get('pull_request', {}).get('number')
+    if repository is None or number is None:
+        return None
+    return f"{repository['full_name']}#{number}"
+
+
+def _transient(exc):
+    if isinstance(exc, gidgethub.DispatchError):
+        return all(_transient(error) for error in exc.errors)
+    return isinstance(exc, _TRANSIENT_ERRORS)
+
+
+async def process_event(event, gh_api, seen, journal=None):
+    try:
+        await coalescer.run(event, lambda event: router.dispatch(event, gh_api))
+    except asyncio.CancelledError:
+        # Stays pending in the journal, to be replayed after the restart
+        raise
+    except Exception as exc:
+        # Let a redelivery try again
+        seen.discard(event.delivery_id)
+        # Replaying repeats whatever the event already wrote, which is only
+        # worth it when the failure can go away by itself
+        if journal is not None and not _transient(exc):
+            journal.drop(event)
+        raise
+    # Superseded events return normally and are done as well
+    if journal is not None:
+        journal.done(event)
+
+
+async def _wait_until_visible(gh_api, event):
+    """Wait until the API serves the head commit the event refers to.
+
+    GitHub can deliver the webhook before the new head is readable, which
+    would make us check an outdated diff. Stops early once a newer push
+    replaced the event.
+    """
+    pr = event.data['pull_request']
+    head_sha = pr['head']['sha']
+
+    async def visible():
+        if not coalescer.is_current(event):
+            return True
+        current = await gh_api.getitem(pr['url'])
+        return current['head']['sha'] == head_sha
+
+    started = asyncio.get_event_loop().time()
+    ready = await utils.poll(visible, config.readiness_timeout)
+    metrics.incr('readiness_wait_seconds', asyncio.get_event_loop().time() - started)
+    if not ready:
+        metrics.incr('readiness_timeouts')
 
 
 @router.register('pull_request', action='opened')
@@ -43,44 +171,59 @@ async def opened_pr(event, gh_api, *args, **kwargs):
     diff_url = pr['_links']['self']['href']  # does not use the diff_url field
     rules_url = f'{config.github_uri}/api/v3/repos/{config.github_owner}/{repo}/contents/barrelman.yml'
 
+    # Give GitHub time to reach internal consistency, checking anyway if it does not
+    await _wait_until_visible(gh_api, event)
+    if not coalescer.is_current(event):
+        return
+
     futures = [
         gh_api.getitem(diff_url, accept=sansio.accept_format(media='diff', json=False)),
         gh_api.getitem(rules_url, accept=sansio.accept_format(media='raw', json=True)),
     ]
 
     diff, rules = await asyncio.gather(*futures)
-    diff = parser.parse_diff(diff)
+    diff = structured_diff.parse(diff)
 
     # if a barrelman.yml file has changed or been added in this PR, check if in valid format
-    if 'barrelman.yml' in diff:
+    if any(f.path == 'barrelman.yml' and f.status != 'removed' for f in diff.files):
         ref = pr['head']['ref']
         new_rules = await gh_api.getitem(f'{rules_url}?ref={ref}', accept=sansio.accept_format(media='raw', json=True))
-        parsed = parser.parse_barrel_rules(new_rules)
+        parsed = rule_cache.parse(new_rules)
         if type(parsed) is str:
             await _create_warning_comment(gh_api, comments_url, parsed, ref)
 
     if rules is None:
         return
 
-    parsed = parser.parse_barrel_rules(rules)
+    parsed = rule_cache.parse(rules)
     if type(parsed) is str:
         # if barrelman.yml file on master branch is corrupted
         await _create_error_comment(gh_api, comments_url, parsed)
         return
 
-    checker = rule_checker.RuleChecker(parsed)
-    checker.check_rules(diff)
+    # Drop lockfiles, vendored code and oversized files before matching
+    policy = skip_policy.SkipPolicy(config.skip_paths, config.max_file_bytes)
+    skipped = policy.apply(diff)
+    metrics.incr('skipped_files', len(skipped))
+
+    checker = await matcher.check(rules, parsed, diff, max_locations=config.match_locations)
 
     # Author of PR cannot be added as a reviewer
     checker.users_to_notify.discard(author)
-    if len(checker.triggered_regex_rules) == 0:
+    if len(checker.triggered_regex_rules) == 0 and len(checker.timed_out_rules) == 0:
+        return
+    # A newer push arrived while matching, its own run will comment
+    if not coalescer.is_current(event):
         return
 
     futures = [
-        _add_code_reviewers(gh_api, repo, pr['number'], list(checker.users_to_notify),
-                            list(checker.teams_to_notify)),
-        _create_comment(gh_api, comments_url, checker.triggered_regex_rules)
+        _create_comment(gh_api, comments_url, checker.triggered_regex_rules,
+                        _quote_matches(diff.buffer, checker.match_locations),
+                        checker.triggered_files, skipped, checker.timed_out_rules)
     ]
+    if checker.users_to_notify or checker.teams_to_notify:
+        futures.append(_add_code_reviewers(gh_api, repo, pr['number'], list(checker.users_to_notify),
+                                           list(checker.teams_to_notify)))
     await asyncio.gather(*futures)
 
 
@@ -89,10 +232,40 @@ async def _add_code_reviewers(gh_api, repo, pr_number, users, teams):
     await gh_api.post(review_url, data={'reviewers': users, 'team_reviewers': teams})
 
 
-async def _create_comment(gh_api, comments_url, regex_rules):
+def _quote_matches(diff, match_locations, max_length=80):
+    quotes = {}
+    for rule, spans in match_locations.items():
+        quotes[rule] = [diff[start:end][:max_length].replace('`', '\'').replace('\n', ' ') for start, end in spans]
+    return quotes
+
+
+def _describe_files(paths, max_paths=5):
+    described = ', '.join(f'`{path}`' for path in paths[:max_paths])
+    if len(paths) > max_paths:
+        described += f' and {len(paths) - max_paths} more'
+    return described
+
+
+async def _create_comment(gh_api, comments_url, regex_rules, quotes={}, files={}, skipped=[],
+                          timed_out=[], max_skipped=10):
     message = '**Patterns matched for this PR**:\n'
     for rule in regex_rules:
-        message += '- ' + str(rule) + '\n'
+        message += '- ' + str(rule)
+        if rule in files:
+            message += ' in ' + _describe_files(files[rule])
+        message += '\n'
+        for quote in quotes.get(rule, []):
+            message += f'  - `{quote}`\n'
+    if timed_out:
+        message += '\n**Patterns not checked in time**:\n'
+        for rule in timed_out:
+            message += '- ' + str(rule) + '\n'
+    if skipped:
+        message += '\n**Files not checked**:\n'
+        for path, reason in skipped[:max_skipped]:
+            message += f'- `{path}`: {reason}\n'
+        if len(skipped) > max_skipped:
+            message += f'- and {len(skipped) - max_skipped} more\n'
     await gh_api.post(comments_url, data={'body': message})
 
 
@@ -106,15 +279,73 @@ async def _create_warning_comment(gh_api, comments_url, message, ref):
     await gh_api.post(comments_url, data={'body': warning_msg})
 
 
+async def _start_matcher(app):
+    matcher.start(config.match_workers, config.match_timeout)
+
+
+async def _close_matcher(app):
+    matcher.close()
+
+
+async def _start_work_queue(app):
+    router.timeout = config.callback_timeout
+    coalescer.delay = config.coalesce_delay
+    app.work_queue.start()
+    if app.journal is not None:
+        # Events accepted before the last shutdown or crash but not processed
+        for event in app.journal.pending():
+            coalescer.track(event)
+            app.work_queue.submit(event, force=True)
+
+
+async def _close_work_queue(app):
+    await app.work_queue.close()
+    if app.journal is not None:
+        app.journal.close()
+
+
+async def _start_github_api(app):
+    app.gh_api.start_refresher()
+
+
+async def _close_github_api(app):
+    await app.gh_api.close()
+
+
 class BarrelmanApp:
     def __init__(self, gh_api):
         self.app = web.Application()
         self.app.gh_api = gh_api
+        self.app.seen_deliveries = dedup.create(
+            config.dedup_backend, config.dedup_ttl, config.dedup_max_size, config.dedup_path)
+        self.app.journal = None
+        if config.journal_path:
+            self.app.journal = journal.Journal(config.journal_path, config.journal_max_replays)
+        if self.app.journal is not None:
+            metrics.register('journal', self.app.journal.stats)
+        self.app.work_queue = work_queue.WorkQueue(
+            functools.partial(process_event, gh_api=gh_api, seen=self.app.seen_deliveries,
+                              journal=self.app.journal),
+            workers=config.webhook_workers, maxsize=config.webhook_queue_size, key=_event_key)
+        metrics.register('work_queue', self.app.work_queue.stats)
+        self.app.on_startup.append(_start_matcher)
+        self.app.on_startup.append(_start_work_queue)
+        self.app.on_startup.append(_start_github_api)
+        self.app.on_cleanup.append(_close_work_queue)
+        self.app.on_cleanup.append(_close_matcher)
+        self.app.on_cleanup.append(_close_github_api)
+        metrics.register('github_connections', gh_api.connection_stats.as_dict)
+        metrics.register('github_token', gh_api.token_stats)
+        if gh_api.scheduler is not None:
+            metrics.register('github_scheduler', gh_api.scheduler.stats)
+        if gh_api.retry_policy is not None:
+            metrics.register('github_retries', gh_api.retry_policy.stats)
 
     def register_routes(self):
         self.app.router.add_get('/', hello)
         self.app.router.add_post('/webhook', github_webhook_handler)
         self.app.router.add_get('/healthz', healthz)
+        self.app.router.add_get('/metrics', metrics_handler)
 
     def run(self):
         web.run_app(self.app, host='127.0.0.1', port=8000)
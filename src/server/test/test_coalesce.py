@@ -0,0 +1,97 @@
+import asyncio
+
+import pytest
+
+from gidgethub import sansio
+from server import coalesce
+
+
+def _event(number=1, action='synchronize', name='pull_request'):
+    data = {'action': action, 'repository': {'full_name': 'owner/repo'},
+            'pull_request': {'number': number}}
+    return sansio.Event(data, event=name, delivery_id=str(id(data)))
+
+
+@pytest.mark.asyncio
+async def test_latest_event_wins():
+    coalescer = coalesce.Coalescer(delay=0.05)
+    dispatched = []
+
+    async def dispatch(event):
+        dispatched.append(event)
+
+    first, second = _event(), _event()
+    coalescer.track(first)
+    coalescer.track(second)
+    assert not coalescer.is_current(first)
+    assert coalescer.is_current(second)
+    await asyncio.gather(coalescer.run(first, dispatch), coalescer.run(second, dispatch))
+    assert dispatched == [second]
+    assert coalescer.stats() == {'pending': 0, 'superseded': 1}
+
+
+@pytest.mark.asyncio
+async def test_newer_event_during_delay():
+    coalescer = coalesce.Coalescer(delay=0.05)
+    dispatched = []
+
+    async def dispatch(event):
+        dispatched.append(event)
+
+    first, second = _event(), _event()
+    coalescer.track(first)
+    running = asyncio.ensure_future(coalescer.run(first, dispatch))
+    await asyncio.sleep(0.01)
+    coalescer.track(second)
+    await coalescer.run(second, dispatch)
+    await running
+    assert dispatched == [second]
+
+
+@pytest.mark.asyncio
+async def test_older_event_after_newer_finished():
+    # A slow older event must not dispatch once the newer one is done.
+    coalescer = coalesce.Coalescer()
+    dispatched = []
+
+    async def dispatch(event):
+        dispatched.append(event)
+
+    first, second = _event(), _event()
+    coalescer.track(first)
+    coalescer.track(second)
+    await coalescer.run(second, dispatch)
+    await coalescer.run(first, dispatch)
+    assert dispatched == [second]
+
+
+@pytest.mark.asyncio
+async def test_independent_events():
+    coalescer = coalesce.Coalescer()
+    dispatched = []
+
+    async def dispatch(event):
+        dispatched.append(event)
+
+    other_pr, closed = _event(number=2), _event(action='closed')
+    events = [_event(), other_pr, closed]
+    for event in events:
+        coalescer.track(event)
+    for event in events:
+        await coalescer.run(event, dispatch)
+    assert dispatched == events
+    assert coalescer.stats()['pending'] == 0
+
+
+@pytest.mark.asyncio
+async def test_dispatch_error():
+    coalescer = coalesce.Coalescer()
+
+    async def dispatch(event):
+        raise RuntimeError('boom')
+
+    event = _event()
+    coalescer.track(event)
+    with pytest.raises(RuntimeError):
+        await coalescer.run(event, dispatch)
+    assert coalescer.stats()['pending'] == 0
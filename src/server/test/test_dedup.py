@@ -0,0 +1,78 @@
+import pytest
+
+from server import dedup
+
+
+class FakeTime:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeTime()
+    monkeypatch.setattr(dedup, 'time', clock)
+    return clock
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def seen(request, clock, tmpdir):
+    seen = dedup.create(request.param, ttl=60, maxsize=3, path=str(tmpdir.join('seen.db')))
+    yield seen
+    if request.param == 'sqlite':
+        seen.close()
+
+
+def test_duplicates(seen):
+    assert seen.add('a')
+    assert seen.add('b')
+    assert not seen.add('a')
+    assert len(seen) == 2
+
+
+def test_ttl(seen, clock):
+    assert seen.add('a')
+    clock.now += 59
+    assert not seen.add('a')
+    clock.now += 1
+    assert seen.add('a')
+    assert len(seen) == 1
+
+
+def test_discard(seen):
+    assert seen.add('a')
+    seen.discard('a')
+    seen.discard('missing')
+    assert seen.add('a')
+
+
+def test_memory_maxsize(clock):
+    seen = dedup.MemorySeenSet(ttl=60, maxsize=3)
+    for key in 'abcd':
+        assert seen.add(key)
+    assert len(seen) == 3
+    # The oldest key was dropped to make room.
+    assert seen.add('a')
+    assert not seen.add('d')
+
+
+def test_sqlite_shared(clock, tmpdir):
+    path = str(tmpdir.join('seen.db'))
+    first, second = dedup.SqliteSeenSet(60, path), dedup.SqliteSeenSet(60, path)
+    try:
+        assert first.add('a')
+        assert not second.add('a')
+    finally:
+        first.close()
+        second.close()
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        dedup.create('redis', ttl=60)
@@ -0,0 +1,156 @@
+import asyncio
+import http
+import json
+import urllib.parse
+
+import pytest
+
+import gidgethub
+from gidgethub import sansio
+from server import dedup, journal, server
+
+JSON = 'application/json'
+FORM = 'application/x-www-form-urlencoded'
+
+
+def _event(number, content_type=JSON):
+    data = {'action': 'closed', 'number': number}
+    body = json.dumps(data).encode()
+    if content_type == FORM:
+        body = urllib.parse.urlencode({'payload': body}).encode()
+    return sansio.Event(data, event='pull_request', delivery_id=f'delivery-{number}'), body
+
+
+@pytest.fixture
+def path(tmpdir):
+    return str(tmpdir.join('journal.db'))
+
+
+def test_pending_until_done(path):
+    events = journal.Journal(path)
+    first, first_body = _event(1)
+    second, second_body = _event(2)
+    events.append(first, first_body, JSON)
+    events.append(second, bytearray(second_body), JSON)
+    events.done(first)
+    events.close()
+
+    events = journal.Journal(path)
+    pending = events.pending()
+    assert [(event.event, event.delivery_id, event.data) for event in pending] == [
+        ('pull_request', 'delivery-2', {'action': 'closed', 'number': 2})]
+    # Replayed events can be marked done as well.
+    events.done(pending[0])
+    assert events.stats() == {'appended': 0, 'replayed': 1, 'dropped': 0, 'in_flight': 0}
+    events.close()
+
+    assert journal.Journal(path).pending() == []
+
+
+def test_form_encoded(path):
+    events = journal.Journal(path)
+    event, body = _event(1, FORM)
+    events.append(event, body, FORM)
+    events.close()
+
+    pending = journal.Journal(path).pending()
+    assert [event.data for event in pending] == [{'action': 'closed', 'number': 1}]
+
+
+def test_undecodable_dropped(path):
+    events = journal.Journal(path)
+    broken, _ = _event(1)
+    events.append(broken, b'payload=%7B', FORM)
+    event, body = _event(2)
+    events.append(event, body, JSON)
+    events.close()
+
+    events = journal.Journal(path)
+    assert [event.delivery_id for event in events.pending()] == ['delivery-2']
+    assert events.stats()['dropped'] == 1
+
+
+def test_max_replays(path):
+    events = journal.Journal(path, max_replays=2)
+    event, body = _event(1)
+    events.append(event, body, JSON)
+    events.close()
+
+    for _ in range(2):
+        events = journal.Journal(path, max_replays=2)
+        assert len(events.pending()) == 1
+        events.close()
+    events = journal.Journal(path, max_replays=2)
+    assert events.pending() == []
+    assert events.stats()['dropped'] == 1
+    events.close()
+    # Dropped events are compacted away like done ones.
+    events = journal.Journal(path)
+    assert events._conn.execute('SELECT COUNT(*) FROM events').fetchone()[0] == 0
+
+
+def test_drop_unknown_event(path):
+    events = journal.Journal(path)
+    event, _ = _event(1)
+    events.done(event)
+    events.drop(event)
+    assert events.pending() == []
+    assert events.stats()['dropped'] == 0
+
+
+def test_compact(path, monkeypatch):
+    monkeypatch.setattr(journal.Journal, 'COMPACT_EVERY', 2)
+    events = journal.Journal(path)
+    appended = [_event(number) for number in range(3)]
+    for event, body in appended:
+        events.append(event, body, JSON)
+    for event, _ in appended[:2]:
+        events.done(event)
+    count = events._conn.execute('SELECT COUNT(*) FROM events').fetchone()[0]
+    assert count == 1
+    assert [event.delivery_id for event in events.pending()] == ['delivery-2']
+
+
+@pytest.mark.asyncio
+async def test_process_event(path, monkeypatch):
+    events = journal.Journal(path)
+    seen = dedup.MemorySeenSet(ttl=60)
+    broken = gidgethub.GitHubBroken(http.HTTPStatus.BAD_GATEWAY)
+    errors = {
+        1: gidgethub.DispatchError([broken]),
+        # A reviewer GitHub refuses to request, after the comment was posted
+        2: gidgethub.DispatchError([broken, gidgethub.BadRequest(http.HTTPStatus.UNPROCESSABLE_ENTITY)]),
+    }
+
+    async def dispatch(event, gh_api):
+        number = event.data['number']
+        if number in errors:
+            raise errors[number]
+        if number == 3:
+            await asyncio.sleep(10)
+
+    monkeypatch.setattr(server.router, 'dispatch', dispatch)
+    ok, transient, failed, cancelled = [_event(number) for number in range(4)]
+    for event, body in (ok, transient, failed, cancelled):
+        events.append(event, body, JSON)
+        seen.add(event.delivery_id)
+
+    await server.process_event(ok[0], None, seen, events)
+    for event, _ in (transient, failed):
+        with pytest.raises(gidgethub.DispatchError):
+            await server.process_event(event, None, seen, events)
+    task = asyncio.ensure_future(server.process_event(cancelled[0], None, seen, events))
+    await asyncio.sleep(0.01)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    assert events.stats()['dropped'] == 1
+    events.close()
+
+    # Transient failures and cancelled events are replayed, and only failed
+    # events are processed again if GitHub redelivers them.
+    pending = journal.Journal(path).pending()
+    assert [event.delivery_id for event in pending] == ['delivery-1', 'delivery-3']
+    assert seen.add('delivery-1')
+    assert seen.add('delivery-2')
+    assert not seen.add('delivery-3')
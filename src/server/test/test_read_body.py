@@ -0,0 +1,81 @@
+import hashlib
+import hmac
+import json
+
+import pytest
+
+from gidgethub import sansio
+from server import server
+
+
+class FakeContent:
+    def __init__(self, chunks):
+        self.chunks = list(chunks)
+        self.reads = 0
+
+    async def readany(self):
+        self.reads += 1
+        return self.chunks.pop(0) if self.chunks else b''
+
+
+class FakeRequest:
+    def __init__(self, chunks, content_length=None, headers=None):
+        self.content = FakeContent(chunks)
+        self.content_length = content_length
+        self.headers = headers or {}
+        self.app = None
+
+
+class RecordingValidator:
+    def __init__(self):
+        self.chunks = []
+
+    def update(self, chunk):
+        self.chunks.append(chunk)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('content_length', [6, None, 2], ids=['sized', 'chunked', 'short'])
+async def test_streaming_read(content_length):
+    request = FakeRequest([b'ab', b'cd', b'ef'], content_length)
+    validator = RecordingValidator()
+    body = await server._read_body(request, validator, limit=6)
+    assert body == bytearray(b'abcdef')
+    assert validator.chunks == [b'ab', b'cd', b'ef']
+
+
+@pytest.mark.asyncio
+async def test_signature_checked_while_reading():
+    payload = json.dumps({'zen': 'Keep it logically awesome.'}).encode()
+    signature = 'sha1=' + hmac.new(b'secret', payload, hashlib.sha1).hexdigest()
+    validator = sansio.EventValidator(signature=signature, secret='secret')
+    request = FakeRequest([payload[:10], payload[10:]])
+    assert await server._read_body(request, validator, limit=1000) == payload
+    validator.verify()
+
+
+@pytest.mark.asyncio
+async def test_content_length_over_limit():
+    request = FakeRequest([b'abcdef'], content_length=6)
+    assert await server._read_body(request, None, limit=5) is None
+    # Refused before reading anything.
+    assert request.content.reads == 0
+
+
+@pytest.mark.asyncio
+async def test_running_size_over_limit():
+    request = FakeRequest([b'abc', b'def', b'ghi'])
+    assert await server._read_body(request, None, limit=5) is None
+    assert request.content.reads == 2
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('content_length', [7, None], ids=['sized', 'chunked'])
+async def test_handler_payload_too_large(monkeypatch, content_length):
+    monkeypatch.setattr(server.config, 'max_body_bytes', 6)
+    monkeypatch.setattr(server.config, 'github_webhook_secret', None)
+    headers = {'x-github-event': 'pull_request', 'x-github-delivery': '1',
+               'content-type': 'application/json'}
+    request = FakeRequest([b'{"a": ', b'1}'], content_length, headers)
+    response = await server.github_webhook_handler(request)
+    assert response.status == 413
@@ -0,0 +1,120 @@
+import asyncio
+
+import pytest
+
+import utils
+from gidgethub import sansio
+from metrics import metrics
+from server import coalesce, server
+
+
+class FakeCheck:
+    """Fail a number of times, then succeed, noting when it was called."""
+
+    def __init__(self, failures):
+        self.failures = failures
+        self.calls = []
+
+    async def __call__(self):
+        self.calls.append(asyncio.get_event_loop().time())
+        return len(self.calls) > self.failures
+
+
+def test_backoff_delays(monkeypatch):
+    monkeypatch.setattr(utils.random, 'uniform', lambda low, high: high)
+    delays = utils.backoff_delays(1.0, 5.0)
+    assert [next(delays) for _ in range(5)] == [1.0, 2.0, 4.0, 5.0, 5.0]
+
+
+@pytest.mark.asyncio
+async def test_poll_until_true():
+    check = FakeCheck(failures=3)
+    assert await utils.poll(check, timeout=5, base=0.01, cap=0.02)
+    assert len(check.calls) == 4
+
+
+@pytest.mark.asyncio
+async def test_poll_backs_off(monkeypatch):
+    monkeypatch.setattr(utils.random, 'uniform', lambda low, high: high)
+    check = FakeCheck(failures=3)
+    assert await utils.poll(check, timeout=5, base=0.02, cap=0.04)
+    gaps = [later - earlier for earlier, later in zip(check.calls, check.calls[1:])]
+    assert gaps[0] >= 0.02
+    assert gaps[1] >= 0.04 and gaps[2] >= 0.04
+    assert gaps[2] < gaps[1] + 0.02
+
+
+@pytest.mark.asyncio
+async def test_poll_deadline():
+    check = FakeCheck(failures=10 ** 6)
+    loop = asyncio.get_event_loop()
+    started = loop.time()
+    # The last sleep is cut short at the deadline.
+    assert not await utils.poll(check, timeout=0.05, base=10, cap=10)
+    assert 0.05 <= loop.time() - started < 1
+    assert len(check.calls) == 2
+
+
+def _event(sha='new'):
+    data = {'action': 'synchronize', 'repository': {'full_name': 'owner/repo'},
+            'pull_request': {'number': 1, 'url': 'https://api.github.com/pulls/1',
+                             'head': {'sha': sha}}}
+    return sansio.Event(data, event='pull_request', delivery_id=sha)
+
+
+class FakeGitHubAPI:
+    """Serve the head commits of shas in turn, then the last one."""
+
+    def __init__(self, shas, on_get=None):
+        self.shas = list(shas)
+        self.on_get = on_get
+        self.gets = 0
+
+    async def getitem(self, url):
+        self.gets += 1
+        if self.on_get is not None:
+            self.on_get()
+        sha = self.shas.pop(0) if len(self.shas) > 1 else self.shas[0]
+        return {'head': {'sha': sha}}
+
+
+@pytest.fixture
+def coalescer(monkeypatch):
+    coalescer = coalesce.Coalescer()
+    monkeypatch.setattr(server, 'coalescer', coalescer)
+    monkeypatch.setattr(server.config, 'readiness_timeout', 0.5)
+    return coalescer
+
+
+@pytest.mark.asyncio
+async def test_wait_until_visible(coalescer):
+    event = _event()
+    coalescer.track(event)
+    gh_api = FakeGitHubAPI(['old', 'old', 'new'])
+    timeouts = metrics.counters['readiness_timeouts']
+    await server._wait_until_visible(gh_api, event)
+    assert gh_api.gets == 3
+    assert metrics.counters['readiness_timeouts'] == timeouts
+
+
+@pytest.mark.asyncio
+async def test_wait_until_visible_timeout(coalescer):
+    event = _event()
+    coalescer.track(event)
+    gh_api = FakeGitHubAPI(['old'])
+    timeouts = metrics.counters['readiness_timeouts']
+    await server._wait_until_visible(gh_api, event)
+    assert gh_api.gets > 1
+    assert metrics.counters['readiness_timeouts'] == timeouts + 1
+
+
+@pytest.mark.asyncio
+async def test_wait_until_visible_superseded(coalescer):
+    event = _event()
+    coalescer.track(event)
+    # A newer push arrives while the first check is in flight.
+    gh_api = FakeGitHubAPI(['old'], on_get=lambda: coalescer.track(_event('newer')))
+    timeouts = metrics.counters['readiness_timeouts']
+    await server._wait_until_visible(gh_api, event)
+    assert gh_api.gets == 1
+    assert metrics.counters['readiness_timeouts'] == timeouts
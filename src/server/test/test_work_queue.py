@@ -0,0 +1,111 @@
+import asyncio
+
+import pytest
+
+from server import work_queue
+
+
+@pytest.mark.asyncio
+async def test_per_key_order():
+    processed = []
+
+    async def handler(event):
+        key, index = event
+        # Later events of a key finish first unless they are serialized.
+        await asyncio.sleep(0.01 * (5 - index))
+        processed.append(event)
+
+    queue = work_queue.WorkQueue(handler, workers=4, maxsize=100, key=lambda event: event[0])
+    queue.start()
+    try:
+        events = [(key, index) for index in range(5) for key in ('a', 'b', 'c')]
+        for event in events:
+            assert queue.submit(event)
+        while queue.depth:
+            await asyncio.sleep(0.01)
+    finally:
+        await queue.close()
+    for key in ('a', 'b', 'c'):
+        assert [index for event_key, index in processed if event_key == key] == list(range(5))
+    assert queue.stats()['accepted'] == 15
+
+
+@pytest.mark.asyncio
+async def test_maxsize():
+    release = asyncio.Event()
+
+    async def handler(event):
+        await release.wait()
+
+    queue = work_queue.WorkQueue(handler, workers=2, maxsize=3)
+    queue.start()
+    try:
+        assert all(queue.submit(index) for index in range(3))
+        assert not queue.submit(3)
+        stats = queue.stats()
+        assert stats['depth'] == 3
+        assert stats['rejected'] == 1
+        release.set()
+        while queue.depth:
+            await asyncio.sleep(0.01)
+        assert queue.submit(4)
+    finally:
+        await queue.close()
+
+
+@pytest.mark.asyncio
+async def test_force_past_maxsize():
+    processed = []
+
+    async def handler(event):
+        processed.append(event)
+
+    queue = work_queue.WorkQueue(handler, workers=1, maxsize=2)
+    queue.start()
+    try:
+        for index in range(5):
+            assert queue.submit(index, force=True)
+        assert not queue.submit(5)
+        while queue.depth:
+            await asyncio.sleep(0.01)
+    finally:
+        await queue.close()
+    assert processed == list(range(5))
+
+
+@pytest.mark.asyncio
+async def test_handler_failure():
+    processed = []
+
+    async def handler(event):
+        if event == 'bad':
+            raise RuntimeError('boom')
+        processed.append(event)
+
+    queue = work_queue.WorkQueue(handler, workers=1, maxsize=10)
+    queue.start()
+    try:
+        queue.submit('bad')
+        queue.submit('good')
+        while queue.depth:
+            await asyncio.sleep(0.01)
+    finally:
+        await queue.close()
+    assert processed == ['good']
+    assert queue.stats()['failed'] == 1
+
+
+@pytest.mark.asyncio
+async def test_close_cancels_workers():
+    started = asyncio.Event()
+
+    async def handler(event):
+        started.set()
+        await asyncio.sleep(10)
+
+    queue = work_queue.WorkQueue(handler, workers=1, maxsize=10)
+    queue.start()
+    queue.submit('slow')
+    await started.wait()
+    await asyncio.wait_for(queue.close(), 1)
+    assert queue.stats()['failed'] == 0
@@ -0,0 +1,96 @@
+import asyncio
+import time
+import traceback
+import zlib
+
+from metrics import Timing
+
+
+class WorkQueue:
+    """A bounded queue of webhook events drained by a fixed set of workers.
+
+    Every worker owns a lane and events are assigned to lanes by hashing
+    their key, so events with the same key are processed one at a time in
+    arrival order while events with different keys run in parallel.
+    """
+
+    def __init__(self, handler, workers, maxsize, key=None):
+        self._handler = handler
+        self._key = key
+        self.workers = workers
+        self.maxsize = maxsize
+        self._lanes = []
+        self._tasks = []
+        self._next_lane = 0
+        self.depth = 0
+        self.accepted = 0
+        self.rejected = 0
+        self.failed = 0
+        self.wait_time = Timing()
+        self.processing_time = Timing()
+
+    def start(self):
+        self._lanes = [asyncio.Queue() for _ in range(self.workers)]
+        self._tasks = [asyncio.ensure_future(self._work(lane)) for lane in self._lanes]
+
+    async def close(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def _lane(self, event):
+        key = self._key(event) if self._key is not None else None
+        if not key:
+            # Unordered events go round robin
+            self._next_lane = (self._next_lane + 1) % self.workers
+            return self._lanes[self._next_lane]
+        return self._lanes[zlib.crc32(key.encode()) % self.workers]
+
+    def submit(self, event, force=False):
+        """Queue event for processing, return False if the queue is full.
+
+        With force the event is queued regardless, like when replaying
+        events that were already acknowledged.
+        """
+        if self.depth >= self.maxsize and not force:
+            self.rejected += 1
+            return False
+        self._lane(event).put_nowait((time.monotonic(), event))
+        self.depth += 1
+        self.accepted += 1
+        return True
+
+    async def _work(self, lane):
+        while True:
+            queued_at, event = await lane.get()
+            started = time.monotonic()
+            self.wait_time.observe(started - queued_at)
+            try:
+                await self._handler(event)
+            except asyncio.CancelledError:
+                # An Exception before Python 3.8, and it must stop the worker.
+                raise
+            except Exception:
+                self.failed += 1
+                traceback.print_exc()
+            finally:
+                self.processing_time.observe(time.monotonic() - started)
+                self.depth -= 1
+                lane.task_done()
+
+    def stats(self):
+        lane_depths = [lane.qsize() for lane in self._lanes]
+        mean = sum(lane_depths) / len(lane_depths) if lane_depths else 0
+        return {
+            'depth': self.depth,
+            'workers': self.workers,
+            'lane_depths': lane_depths,
+            # Deepest lane relative to the average, 1.0 when evenly spread.
+            'lane_skew': max(lane_depths) / mean if mean else 0.0,
+            'accepted': self.accepted,
+            'rejected': self.rejected,
+            'failed': self.failed,
+            'wait_time': self.wait_time.stats(),
+            'processing_time': self.processing_time.stats(),
+        }
@@ -1,4 +1,5 @@
 import asyncio
+import random
 
 
 async def run_coroutines_and_wait(coroutines):
@@ -21,3 +22,27 @@ async def run_coroutine_groups_and_wait(*coroutine_groups):
 
     for coroutines in coroutine_groups:
         await run_coroutines_and_wait(coroutines)
+
+
+def backoff_delays(base, cap, factor=2):
+    """Yield exponentially growing delays with full jitter, never above cap."""
+    delay = base
+    while True:
+        yield random.uniform(0, delay)
+        delay = min(cap, delay * factor)
+
+
+async def poll(check, timeout, base=0.1, cap=2.0):
+    """Await check() with backoff until it returns true or timeout seconds pass.
+
+    Returns whether check() succeeded in time.
+    """
+    loop = asyncio.get_event_loop()
+    deadline = loop.time() + timeout
+    for delay in backoff_delays(base, cap):
+        if await check():
+            return True
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            return False
+        await asyncio.sleep(min(delay, remaining))